@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# runs several conan create of the recipe at once, each in its own conan home, under the make scheduling modes
+# of the recipe and reports the wall time of every build, of the whole batch and the peak load average:
+#     unbounded  every build runs make -j<cpus>, as before the scheduling
+#     budgeted   CONAN_OPENSSL_MAX_LOAD=<cpus> and CONAN_OPENSSL_MEMORY_PER_JOB (default 512) MB per job
+#     jobserver  the builds share the job slots of a parent make, GNU make 4.4 and later only
+# CONAN_OPENSSL_CONCURRENT_BUILDS sets the number of builds (default 4), the arguments are passed to conan create:
+#     python .ci/benchmark_concurrent_builds.py -s build_type=Release
+
+from __future__ import print_function
+import os
+import re
+import sys
+import time
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+
+
+def make_version():
+    try:
+        output = subprocess.check_output(["make", "--version"]).decode()
+    except (OSError, subprocess.CalledProcessError):
+        return ()
+    match = re.search(r"GNU Make (\d+)\.(\d+)", output)
+    return (int(match.group(1)), int(match.group(2))) if match else ()
+
+
+def create_command(home, arguments):
+    recipe_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # --build=OpenSSL: every run compiles, the requirements come from the cache of the home
+    return ["conan", "create", recipe_folder, "conan/benchmark", "--build=OpenSSL"] + arguments, \
+        os.path.join(home, "build.log")
+
+
+def run_batch(root, mode, count, cpus, arguments):
+    env = dict(os.environ)
+    env.pop("MAKEFLAGS", None)
+    env.setdefault("CONAN_OPENSSL_SOURCE_CACHE", os.path.join(root, "sources"))
+    if mode == "budgeted":
+        env["CONAN_OPENSSL_MAX_LOAD"] = str(cpus)
+        env.setdefault("CONAN_OPENSSL_MEMORY_PER_JOB", "512")
+    else:
+        env.pop("CONAN_OPENSSL_MAX_LOAD", None)
+        env.pop("CONAN_OPENSSL_MEMORY_PER_JOB", None)
+    homes = [os.path.join(root, mode, "build-%d" % (i + 1)) for i in range(count)]
+    with open(os.devnull, "w") as devnull:
+        for home in homes:
+            os.makedirs(home)
+            subprocess.check_call(["conan", "config", "set", "storage.download_cache=%s" % os.path.join(root, "cache")],
+                                  env=dict(env, CONAN_USER_HOME=home), stdout=devnull)
+
+    durations = [None] * count
+    peak_load = [0.0]
+    done = threading.Event()
+
+    def sample_load():
+        while not done.wait(1):
+            peak_load[0] = max(peak_load[0], os.getloadavg()[0])
+
+    def run(index):
+        command, log_path = create_command(homes[index], arguments)
+        start = time.time()
+        with open(log_path, "w") as log:
+            status = subprocess.call(command, env=dict(env, CONAN_USER_HOME=homes[index]), stdout=log,
+                                     stderr=subprocess.STDOUT)
+        durations[index] = (time.time() - start, status)
+
+    sampler = threading.Thread(target=sample_load)
+    sampler.start()
+    start = time.time()
+    if mode == "jobserver":
+        # a parent make with one target per build: "+" hands the jobserver of make -j<cpus> to the recipes
+        makefile = os.path.join(root, mode, "Makefile")
+        with open(makefile, "w") as f:
+            f.write("all: %s\n" % " ".join("build-%d" % (i + 1) for i in range(count)))
+            for index, home in enumerate(homes):
+                command, log_path = create_command(home, arguments)
+                f.write("build-%d:\n\t+@CONAN_USER_HOME=%s /usr/bin/time -f %%e -o %s.time %s > %s 2>&1\n"
+                        % (index + 1, home, log_path, " ".join("'%s'" % part for part in command), log_path))
+        status = subprocess.call(["make", "-f", makefile, "-j%d" % cpus, "--jobserver-style=fifo", "-k"], env=env)
+        for index, home in enumerate(homes):
+            with open(os.path.join(home, "build.log.time")) as f:
+                durations[index] = (float(f.read().split()[-1]), status)
+    else:
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall_time = time.time() - start
+    done.set()
+    sampler.join()
+    return wall_time, durations, peak_load[0]
+
+
+def main(arguments):
+    count = int(os.environ.get("CONAN_OPENSSL_CONCURRENT_BUILDS", 4))
+    cpus = multiprocessing.cpu_count()
+    modes = ["unbounded", "budgeted"]
+    if make_version() >= (4, 4):
+        modes.append("jobserver")
+    else:
+        print("GNU make older than 4.4, the jobserver mode is skipped")
+    root = tempfile.mkdtemp(prefix="openssl-concurrent-")
+    print("%d concurrent builds on %d CPUs, logs in %s" % (count, cpus, root))
+    for mode in modes:
+        wall_time, durations, peak_load = run_batch(root, mode, count, cpus, arguments)
+        failed = sum(1 for _, status in durations if status != 0)
+        print("%-10s wall %7.1fs, builds %s, peak load %.1f%s" %
+              (mode, wall_time, " ".join("%.1fs" % duration for duration, _ in durations), peak_load,
+               ", %d FAILED" % failed if failed else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# time to the next build after the cache cleanup of a CI job: the former blanket conan remove "*" against the
+# evict_openssl.py hook. for each of them, a fresh conan home builds the recipe once, the cleanup runs, and the
+# following conan create (requirements, build requirements and sources as the cleanup left them) is timed.
+# the arguments are passed to conan create, e.g.
+#     python .ci/benchmark_eviction.py -s build_type=Release
+
+from __future__ import print_function
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+REFERENCE = "conan/benchmark"
+CLEANUPS = ["remove *", "evict_openssl"]
+
+
+def conan(home, arguments, log=None):
+    env = dict(os.environ)
+    env["CONAN_USER_HOME"] = home
+    start = time.time()
+    subprocess.check_call(["conan"] + arguments, env=env, stdout=log, stderr=subprocess.STDOUT if log else None)
+    return time.time() - start
+
+
+def cache_size(home):
+    size = 0
+    for root, _, files in os.walk(os.path.join(home, ".conan", "data")):
+        for filename in files:
+            path = os.path.join(root, filename)
+            if not os.path.islink(path):
+                size += os.path.getsize(path)
+    return size
+
+
+def main(arguments):
+    recipe_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    root = tempfile.mkdtemp(prefix="openssl-eviction-")
+    create = ["create", recipe_folder, REFERENCE] + arguments
+    print("logs in %s" % root)
+    results = []
+    for cleanup in CLEANUPS:
+        home = os.path.join(root, cleanup.split()[0])
+        os.makedirs(home)
+        with open(os.path.join(home, "benchmark.log"), "w") as log:
+            first = conan(home, create, log)
+            if cleanup == "remove *":
+                conan(home, ["remove", "*", "-f"], log)
+            else:
+                # what the pre_export hook of the next export does, the recipe is unchanged
+                env = dict(os.environ, CONAN_USER_HOME=home)
+                subprocess.check_call([sys.executable, "-c",
+                                       "import sys; sys.path.insert(0, %r)\n"
+                                       "from conans.client import conan_api\n"
+                                       "from evict_openssl import evict\n"
+                                       "instance, _, _ = conan_api.Conan.factory()\n"
+                                       "evict(instance, print)" % os.path.dirname(os.path.abspath(__file__))],
+                                      env=env, stdout=log, stderr=subprocess.STDOUT)
+            kept = cache_size(home)
+            second = conan(home, create, log)
+        results.append((cleanup, first, kept, second))
+
+    print("%-16s %12s %14s %16s" % ("cleanup", "first build", "cache kept", "next build"))
+    for cleanup, first, kept, second in results:
+        print("%-16s %11.1fs %11.1f MB %15.1fs" % (cleanup, first, kept / 1e6, second))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
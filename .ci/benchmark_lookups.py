@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# micro-benchmark of the lookups the recipe does on every method call: the Configure target resolution
+# (_TargetIndex against the fnmatch scan over _targets it replaced) and the OpenSSLVersion comparisons
+# (interned versions against the class as it was before), e.g.
+#     python .ci/benchmark_lookups.py
+
+from __future__ import print_function
+import os
+import sys
+import fnmatch
+import timeit
+from functools import total_ordering
+
+from conans.client.conf import get_default_settings_yml
+from conans.client.output import ConanOutput
+from conans.model.settings import Settings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conanfile import OpenSSLConan, OpenSSLVersion, _TargetIndex  # noqa: E402
+
+QUERIES = ["Linux-x86_64-gcc", "Linux-armv8-clang", "Windows-x86_64-Visual Studio", "Macos-armv8-apple-clang",
+           "Android-armv7-clang", "iOS-armv8-apple-clang", "FreeBSD-x86_64-clang", "Neutrino-armv7-qcc"]
+
+
+@total_ordering
+class LegacyOpenSSLVersion(object):
+    # OpenSSLVersion before it was interned (with its patch slicing fixed): parsed again, and compared
+    # through lists, on every comparison
+    def __init__(self, version_str):
+        self._pre = ""
+
+        tokens = version_str.split("-")
+        if len(tokens) > 1:
+            self._pre = tokens[1]
+        version_str = tokens[0]
+
+        tokens = version_str.split(".")
+        self._major = int(tokens[0])
+        self._minor = 0
+        self._patch = 0
+        self._build = ""
+        if len(tokens) > 1:
+            self._minor = int(tokens[1])
+            if len(tokens) > 2:
+                self._patch = tokens[2]
+                if self._patch[-1].isalpha():
+                    self._build = self._patch[-1]
+                    self._patch = self._patch[:-1]
+                self._patch = int(self._patch)
+
+    @property
+    def as_list(self):
+        return [self._major, self._minor, self._patch, self._build, self._pre]
+
+    def __eq__(self, other):
+        return self.compare(other) == 0
+
+    def __lt__(self, other):
+        return self.compare(other) == -1
+
+    def __hash__(self):
+        return hash(tuple(self.as_list))
+
+    def compare(self, other):
+        if not isinstance(other, LegacyOpenSSLVersion):
+            other = LegacyOpenSSLVersion(other)
+        if self.as_list == other.as_list:
+            return 0
+        elif self.as_list < other.as_list:
+            return -1
+        else:
+            return 1
+
+
+def fnmatch_scan(targets, query):
+    # the lookup of OpenSSLConan._ancestor_target before _TargetIndex
+    return next((targets[i] for i in targets if fnmatch.fnmatch(query, i)), None)
+
+
+def recipe_targets(version):
+    recipe = OpenSSLConan(ConanOutput(sys.stdout), None, display_name="OpenSSL")
+    recipe.version = version
+    settings = Settings.loads(get_default_settings_yml())
+    settings.os = "Linux"
+    settings.build_type = "Release"
+    recipe.settings = settings
+    return recipe._targets
+
+
+def per_call(statement, number, **namespace):
+    # best of 5 runs, in microseconds
+    return min(timeit.repeat(statement, number=number, repeat=5, globals=namespace)) / number * 1e6
+
+
+def report(name, before, after):
+    print("%-44s %9.3f us %9.3f us %7.1fx" % (name, before, after, before / after))
+
+
+def main():
+    print("%-44s %12s %12s %8s" % ("", "before", "after", ""))
+    for version in ["1.0.2s", "1.1.1c"]:
+        targets = recipe_targets(version)
+        for query in QUERIES:
+            assert fnmatch_scan(targets, query) == _TargetIndex(targets).resolve(query), query
+        index = _TargetIndex(targets)
+        before = per_call("for q in queries: scan(targets, q)", 2000, scan=fnmatch_scan, targets=targets,
+                          queries=QUERIES) / len(QUERIES)
+        cold = per_call("for q in queries: Index(targets).resolve(q)", 500, Index=_TargetIndex, targets=targets,
+                        queries=QUERIES) / len(QUERIES)
+        warm = per_call("for q in queries: index.resolve(q)", 20000, index=index, queries=QUERIES) / len(QUERIES)
+        report("%s target, index built per lookup" % version, before, cold)
+        report("%s target, shared index" % version, before, warm)
+
+    comparisons = "v = Version('1.1.1c'); v < '1.1.0'; v >= '1.1.1'; v == '1.0.2s'"
+    report("OpenSSLVersion, 3 comparisons",
+           per_call(comparisons, 20000, Version=LegacyOpenSSLVersion),
+           per_call(comparisons, 20000, Version=OpenSSLVersion))
+    sort = "sorted(Version(v) for v in versions)"
+    versions = ["1.0.2%s" % c for c in "abcdefghijklmnopqrstu"] + ["1.1.0%s" % c for c in "abcdefghijkl"] + \
+        ["1.1.1%s" % c for c in "abcdefghijk"]
+    report("OpenSSLVersion, sorting %d versions" % len(versions),
+           per_call(sort, 500, Version=LegacyOpenSSLVersion, versions=versions),
+           per_call(sort, 500, Version=OpenSSLVersion, versions=versions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# throughput report of the lto and pgo options: builds the recipe without them, with lto and with lto and pgo,
+# then runs openssl speed and loopback s_server/s_time handshakes with the openssl program of every package.
+# Linux, gcc or clang, 1.1.1 or later. the arguments are passed to conan create, e.g.
+#     python .ci/benchmark_lto_pgo.py -s build_type=Release -o OpenSSL:shared=True
+
+from __future__ import print_function
+import os
+import re
+import sys
+import json
+import time
+import socket
+import tempfile
+import subprocess
+
+VARIANTS = [("baseline", []),
+            ("lto", ["-o", "OpenSSL:lto=True"]),
+            ("lto+pgo", ["-o", "OpenSSL:lto=True", "-o", "OpenSSL:pgo=True"])]
+SECONDS = int(os.environ.get("CONAN_OPENSSL_BENCHMARK", 3))
+
+
+def create(home, arguments):
+    recipe_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    json_path = os.path.join(home, "create.json")
+    env = dict(os.environ)
+    env["CONAN_USER_HOME"] = home
+    subprocess.check_call(["conan", "create", recipe_folder, "conan/benchmark", "--json", json_path] + arguments,
+                          env=env)
+    with open(json_path) as f:
+        result = json.load(f)
+    for installed in result["installed"]:
+        if installed["recipe"]["id"].startswith("OpenSSL/"):
+            return installed["packages"][0]["cpp_info"]["rootpath"]
+    raise Exception("no OpenSSL package in %s" % json_path)
+
+
+def openssl_command(package_folder, *arguments):
+    env = dict(os.environ)
+    env["LD_LIBRARY_PATH"] = os.path.join(package_folder, "lib")
+    return [os.path.join(package_folder, "bin", "openssl")] + list(arguments), env
+
+
+def speed(package_folder):
+    # -mr lines: +F:<n>:<cipher>:<bytes/s>, +F2 rsa and +F4 ecdsa :<n>:<bits>:<sign/s>:<verify/s>, +F5 ecdh
+    results = {}
+    for arguments in [["-bytes", "16384", "-evp", "aes-128-gcm"], ["-bytes", "16384", "-evp", "chacha20-poly1305"],
+                      ["sha256", "rsa2048", "ecdhp256", "ecdsap256"]]:
+        command, env = openssl_command(package_folder, "speed", "-mr", "-seconds", str(SECONDS), *arguments)
+        output = subprocess.check_output(command, env=env, stderr=subprocess.STDOUT).decode()
+        for line in output.splitlines():
+            fields = line.split(":")
+            if fields[0] == "+F":
+                results["%s MB/s" % fields[2].lower()] = float(fields[-1]) / 1e6
+            elif fields[0] in ["+F2", "+F4"]:
+                algorithm = "rsa%s" % fields[2] if fields[0] == "+F2" else "ecdsap%s" % fields[2]
+                results["%s sign/s" % algorithm] = float(fields[3])
+                results["%s verify/s" % algorithm] = float(fields[4])
+            elif fields[0] == "+F5":
+                results["ecdhp%s op/s" % fields[2]] = float(fields[3])
+    return results
+
+
+def handshakes(package_folder, workdir):
+    command, env = openssl_command(package_folder, "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout",
+                                   "key.pem", "-out", "cert.pem", "-days", "1", "-subj", "/CN=localhost")
+    with open(os.devnull, "w") as devnull:
+        subprocess.check_call(command, env=env, cwd=workdir, stdout=devnull, stderr=devnull)
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    command, env = openssl_command(package_folder, "s_server", "-accept", str(port), "-cert", "cert.pem",
+                                   "-key", "key.pem", "-quiet")
+    with open(os.devnull, "r+") as devnull:
+        server = subprocess.Popen(command, env=env, cwd=workdir, stdin=devnull, stdout=devnull, stderr=devnull)
+        try:
+            time.sleep(1)
+            command, env = openssl_command(package_folder, "s_time", "-connect", "127.0.0.1:%d" % port, "-new",
+                                           "-time", str(SECONDS))
+            output = subprocess.check_output(command, env=env, stderr=subprocess.STDOUT).decode()
+        finally:
+            server.kill()
+    match = re.search(r"(\d+) connections in (\d+) real seconds", output)
+    return {"full handshakes/s": int(match.group(1)) / float(match.group(2))}
+
+
+def main(arguments):
+    root = tempfile.mkdtemp(prefix="openssl-lto-pgo-")
+    results = []
+    for name, options in VARIANTS:
+        package_folder = create(os.path.join(root, name), options + arguments)
+        workdir = os.path.join(root, name, "handshakes")
+        os.makedirs(workdir)
+        measured = speed(package_folder)
+        measured.update(handshakes(package_folder, workdir))
+        results.append(measured)
+
+    print("%-28s" % "" + "".join("%14s" % name for name, _ in VARIANTS))
+    for metric in sorted(results[0]):
+        baseline = results[0][metric]
+        print("%-28s" % metric + "%14.1f" % baseline +
+              "".join("%8.1f %+4.0f%%" % (result[metric], (result[metric] / baseline - 1) * 100)
+                      for result in results[1:]))
+    print("conan homes kept in %s" % root)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# wall time, peak disk use and peak RSS of getting the sources from a local http server: tools.get and a rename,
+# as source() did before, against the streaming _get_tarball without and with a source cache. every variant runs
+# in its own process. the tarball is generated (about the size of an OpenSSL release) or given, e.g.
+#     python .ci/benchmark_source_download.py [openssl-1.1.1c.tar.gz]
+
+from __future__ import print_function
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import hashlib
+import tarfile
+import tempfile
+import resource
+import threading
+import subprocess
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VARIANTS = ["tools.get", "streaming", "streaming+cache"]
+REPEAT = 5
+
+
+def generate_tarball(path, version):
+    # ~3000 source-like files, ~45 MB unpacked and ~10 MB compressed
+    words = ["".join(random.choice("abcdefghijklmnopqrstuvwxyz_") for _ in range(random.randint(2, 12)))
+             for _ in range(2000)]
+    with tarfile.open(path, "w:gz") as tar:
+        for index in range(3000):
+            content = " ".join(random.choice(words) for _ in range(2000)).encode()
+            info = tarfile.TarInfo("openssl-%s/crypto/module%d/file%d.c" % (version, index // 50, index))
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+
+
+class _Config(object):
+    # the parts of conan.conf tools.download reads
+    retry = 0
+    retry_wait = 0
+    download_cache = None
+
+
+def measure(variant, url, sha256, version, workdir):
+    from conans import tools
+    from conans.client.output import ConanOutput
+    import requests
+    from conanfile import OpenSSLConan
+
+    output = ConanOutput(io.StringIO())
+    tools.set_global_instances(output, requests, _Config())
+    recipe = OpenSSLConan(output, None, display_name="OpenSSL")
+    recipe.version = version
+
+    statvfs = os.statvfs(workdir)
+    used_at_start = (statvfs.f_blocks - statvfs.f_bfree) * statvfs.f_frsize
+    peak = [0]
+    done = threading.Event()
+
+    def sample_disk():
+        while not done.wait(0.005):
+            stat = os.statvfs(workdir)
+            peak[0] = max(peak[0], (stat.f_blocks - stat.f_bfree) * stat.f_frsize - used_at_start)
+
+    sampler = threading.Thread(target=sample_disk)
+    sampler.start()
+    start = time.time()
+    # the local server is the first mirror, the official ones after it are never reached
+    env = {"CONAN_OPENSSL_SOURCE_CACHE": os.path.join(workdir, "cache") if variant == "streaming+cache" else None,
+           "CONAN_OPENSSL_MIRRORS": url.rsplit("/", 1)[0] + "/"}
+    with tools.chdir(workdir), tools.environment_append(env):
+        if variant == "tools.get":
+            tools.get(url, sha256=sha256)
+            os.rename("openssl-%s" % version, "sources")
+        else:
+            recipe._get_tarball(sha256)
+    wall_time = time.time() - start
+    done.set()
+    sampler.join()
+    return {"wall": wall_time, "disk": peak[0], "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+def main(arguments):
+    if arguments[:1] == ["--measure"]:
+        variant, url, sha256, version, workdir = arguments[1:]
+        print(json.dumps(measure(variant, url, sha256, version, workdir)))
+        return 0
+
+    root = tempfile.mkdtemp(prefix="openssl-source-download-")
+    served = os.path.join(root, "served")
+    os.makedirs(served)
+    version = "1.1.1c"
+    tarball = os.path.join(served, "openssl-%s.tar.gz" % version)
+    if arguments:
+        version = os.path.basename(arguments[0])[len("openssl-"):-len(".tar.gz")]
+        tarball = os.path.join(served, os.path.basename(arguments[0]))
+        shutil.copy(arguments[0], tarball)
+    else:
+        generate_tarball(tarball, version)
+    with open(tarball, "rb") as f:
+        sha256 = hashlib.sha256(f.read()).hexdigest()
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            kwargs["directory"] = served
+            SimpleHTTPRequestHandler.__init__(self, *args, **kwargs)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever).start()
+    url = "http://127.0.0.1:%d/%s" % (server.server_port, os.path.basename(tarball))
+    print("%s, %.1f MB, best of %d" % (os.path.basename(tarball), os.path.getsize(tarball) / 1e6, REPEAT))
+    print("%-16s %10s %14s %12s" % ("", "wall", "peak disk", "peak RSS"))
+    try:
+        for variant in VARIANTS:
+            results = []
+            for _ in range(REPEAT):
+                workdir = tempfile.mkdtemp(dir=root)
+                output = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--measure", variant,
+                                                  url, sha256, version, workdir])
+                results.append(json.loads(output.decode().splitlines()[-1]))
+                shutil.rmtree(workdir)
+            print("%-16s %9.2fs %11.1f MB %9.1f MB" % (variant, min(r["wall"] for r in results),
+                                                      min(r["disk"] for r in results) / 1e6,
+                                                      min(r["rss"] for r in results) / 1e6))
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(root)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
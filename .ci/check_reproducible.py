@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# builds the recipe with reproducible=True twice, in conan homes of different folders, and compares the libraries
+# and programs of both packages byte for byte. the arguments are passed to conan create, e.g.
+#     python .ci/check_reproducible.py -s build_type=Release -o OpenSSL:shared=True
+
+from __future__ import print_function
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import subprocess
+
+
+def sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def binaries(package_folder):
+    # lib and bin, symbolic links compared by their target
+    files = {}
+    for folder in ["lib", "bin"]:
+        for root, _, filenames in os.walk(os.path.join(package_folder, folder)):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                relative = os.path.relpath(path, package_folder)
+                files[relative] = "-> %s" % os.readlink(path) if os.path.islink(path) else sha256(path)
+    return files
+
+
+def create(home, download_cache, arguments):
+    recipe_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["CONAN_USER_HOME"] = home
+    json_path = os.path.join(home, "create.json")
+    subprocess.check_call(["conan", "config", "set", "storage.download_cache=%s" % download_cache], env=env)
+    subprocess.check_call(["conan", "create", recipe_folder, "conan/reproducible", "-o", "OpenSSL:reproducible=True",
+                           "--json", json_path] + arguments, env=env)
+    with open(json_path) as f:
+        result = json.load(f)
+    for installed in result["installed"]:
+        if installed["recipe"]["id"].startswith("OpenSSL/"):
+            return installed["packages"][0]["cpp_info"]["rootpath"]
+    raise Exception("no OpenSSL package in %s" % json_path)
+
+
+def main(arguments):
+    root = tempfile.mkdtemp(prefix="openssl-reproducible-")
+    download_cache = os.path.join(root, "download-cache")
+    # folders of different lengths, so that embedded paths show up as differences even when padded
+    first = create(os.path.join(root, "a"), download_cache, arguments)
+    second = create(os.path.join(root, "second-build", "in-a-longer-folder"), download_cache, arguments)
+
+    first_files, second_files = binaries(first), binaries(second)
+    differences = sorted(name for name in set(first_files) | set(second_files)
+                         if first_files.get(name) != second_files.get(name))
+    for name in sorted(first_files):
+        print("%s %s" % ("DIFFERS " if name in differences else "ok      ", name))
+    for name in differences:
+        if name not in first_files or name not in second_files:
+            print("only in one package: %s" % name)
+    if differences:
+        print("%d of %d files differ, the packages are kept in %s" % (len(differences), len(first_files), root))
+        return 1
+    print("%d files identical" % len(first_files))
+    shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
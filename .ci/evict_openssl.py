@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import fnmatch
+
+from conans import tools
+from conans.client import conan_api
+
+
+def _folder_size(folder):
+    size = 0
+    for root, _, files in os.walk(folder):
+        for filename in files:
+            path = os.path.join(root, filename)
+            if not os.path.islink(path):
+                size += os.path.getsize(path)
+    return size
+
+
+def _cached_references(storage, name="openssl"):
+    # <storage>/<name>/<version>/<user>/<channel>, "_" stands for no user and channel
+    if not os.path.isdir(storage):
+        return
+    for ref_name in os.listdir(storage):
+        if ref_name.lower() != name or not os.path.isdir(os.path.join(storage, ref_name)):
+            continue
+        for version in os.listdir(os.path.join(storage, ref_name)):
+            for user in os.listdir(os.path.join(storage, ref_name, version)):
+                for channel in os.listdir(os.path.join(storage, ref_name, version, user)):
+                    folder = os.path.join(storage, ref_name, version, user, channel)
+                    if not os.path.isdir(folder):
+                        continue
+                    if user == "_" and channel == "_":
+                        yield "%s/%s@" % (ref_name, version), folder
+                    else:
+                        yield "%s/%s@%s/%s" % (ref_name, version, user, channel), folder
+
+
+def _entries(reference, folder):
+    # the evictable parts of a cached reference: binary packages, build folders and sources. the mtime
+    # of a folder is its last write (build, download or retrieval from a remote), conan doesn't touch it
+    # when a package is merely used, so the order is oldest written first rather than least recently used
+    for kind in ["package", "build"]:
+        if not os.path.isdir(os.path.join(folder, kind)):
+            continue
+        for package_id in os.listdir(os.path.join(folder, kind)):
+            path = os.path.join(folder, kind, package_id)
+            if not os.path.isdir(path):
+                continue  # <package_id>.dirty markers and other files of conan
+            yield os.path.getmtime(path), _folder_size(path), reference, kind, package_id
+    if os.path.isdir(os.path.join(folder, "source")):
+        path = os.path.join(folder, "source")
+        yield os.path.getmtime(path), _folder_size(path), reference, "source", None
+
+
+def evict(instance, log, keep=None):
+    # keeps the cached OpenSSL packages, builds and sources within CONAN_OPENSSL_CACHE_SIZE (MB) and
+    # CONAN_OPENSSL_CACHE_MAX_AGE (days), oldest written first. other references (zlib and the
+    # build requirements) and the keep reference are left alone
+    budget = tools.get_env("CONAN_OPENSSL_CACHE_SIZE", 2048) * 1024 * 1024
+    max_age = tools.get_env("CONAN_OPENSSL_CACHE_MAX_AGE", 0) * 24 * 3600
+    storage = instance.config_get("storage.path")
+    entries = []
+    for reference, folder in _cached_references(storage):
+        if reference.rstrip("@") != keep:
+            entries.extend(_entries(reference, folder))
+    entries.sort()
+    total = sum(entry[1] for entry in entries)
+    now = time.time()
+    for mtime, size, reference, kind, package_id in entries:
+        if total <= budget and (not max_age or now - mtime <= max_age):
+            continue
+        log("evicting %s %s %s (%.1f MB)" % (reference, kind, package_id or "", size / (1024.0 * 1024.0)))
+        if kind == "package":
+            instance.remove(reference, packages=[package_id], force=True)
+        elif kind == "build":
+            instance.remove(reference, builds=[package_id], force=True)
+        else:
+            instance.remove(reference, src=True, force=True)
+        total -= size
+
+
+def _exported_files(folder, patterns=None):
+    # relative path -> content of the recipe files: conanfile.py and the exports patterns, or everything the
+    # export folder of the cache holds but its manifest
+    files = {}
+    for root, folders, filenames in os.walk(folder):
+        folders[:] = [name for name in folders if name != ".git"]
+        for filename in filenames:
+            path = os.path.relpath(os.path.join(root, filename), folder).replace("\\", "/")
+            if patterns is None and path == "conanmanifest.txt":
+                continue
+            if patterns is not None and path != "conanfile.py" and \
+                    not any(fnmatch.fnmatch(path, pattern) for pattern in patterns):
+                continue
+            files[path] = tools.load(os.path.join(root, filename), binary=True)
+    return files
+
+
+def pre_export(output, conanfile, conanfile_path, reference, **kwargs):
+    instance, _, _ = conan_api.Conan.factory()
+    storage = instance.config_get("storage.path")
+    # the binaries of a modified recipe are stale, an unchanged recipe keeps its packages warm. every exported
+    # file counts, openssl_compatibility.py changes the package ids as much as conanfile.py does
+    exported = os.path.join(storage, reference.dir_repr(), "export")
+    current = str(reference).rstrip("@")
+    patterns = getattr(conanfile, "exports", None) or []
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    if os.path.isfile(os.path.join(exported, "conanfile.py")) and \
+            _exported_files(exported) != _exported_files(os.path.dirname(conanfile_path), patterns):
+        output.info("recipe changed, removing the cached %s" % current)
+        instance.remove(current, force=True)
+    evict(instance, output.info, keep=current)
@@ -1,17 +1,200 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+from __future__ import print_function
+import os
+import sys
+import time
+import json
+import subprocess
+from multiprocessing.pool import ThreadPool
 from cpt.packager import ConanMultiPackager
 from cpt.ci_manager import is_azure_pipelines
+from conans import tools
+from conans.model.version import Version
+from openssl_compatibility import compatible_compiler_versions
+
+
+def variant_key(build):
+    # static/shared and Debug/Release variants of the same configuration run back to back,
+    # so they share the source cache and the compiler cache while both are warm
+    settings = build.settings
+    return sorted((name, value) for name, value in settings.items() if name != "build_type")
+
+
+def describe(build):
+    values = [build.settings.get(name) for name in ["os", "arch", "compiler", "compiler.version", "build_type"]]
+    values.extend("%s=%s" % (name.split(":")[-1], value) for name, value in sorted(build.options.items())
+                  if name != "OpenSSL:compiler_launcher")
+    return " ".join(str(value) for value in values if value)
+
+
+def collapse_matrix(builds):
+    # splits the matrix into the cells to build and the ones whose consumers get a compatible binary
+    # of another cell, following OpenSSLConan._add_compatible_packages
+    def key(build, version=None, fpic=None):
+        settings = dict(build.settings)
+        options = {name: str(value) for name, value in build.options.items() if name != "OpenSSL:compiler_launcher"}
+        if version:
+            settings["compiler.version"] = version
+        if fpic:
+            options["OpenSSL:fPIC"] = "True"
+        return tuple(sorted(settings.items())), tuple(sorted(options.items()))
+
+    known_versions = set(str(build.settings.get("compiler.version")) for build in builds)
+    kept = {}
+    collapsed = []
+    # the fallbacks are older compilers and fPIC=True, so they are visited first
+    for build in sorted(builds, key=lambda b: (Version(str(b.settings.get("compiler.version", "0"))),
+                                               str(b.options.get("OpenSSL:fPIC")) != "True")):
+        pic_fallback = str(build.options.get("OpenSSL:shared")) != "True" and \
+            str(build.options.get("OpenSSL:fPIC")) == "False"
+        versions = []
+        if str(build.options.get("OpenSSL:lto")) != "True" and build.settings.get("compiler.version"):
+            versions = compatible_compiler_versions(build.settings["compiler"], build.settings["compiler.version"],
+                                                    known_versions)
+        candidates = [key(build, fpic=True)] if pic_fallback else []
+        for version in versions:
+            candidates.append(key(build, version=version))
+            if pic_fallback:
+                candidates.append(key(build, version=version, fpic=True))
+        fallback = next((kept[candidate] for candidate in candidates if candidate in kept), None)
+        if fallback:
+            collapsed.append((build, fallback))
+        else:
+            kept[key(build)] = build
+    kept_builds = set(id(build) for build in kept.values())
+    return [build for build in builds if id(build) in kept_builds], collapsed
+
+
+def available_memory_mb():
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
+
+def format_duration(seconds):
+    return "%dm%02ds" % divmod(int(seconds), 60)
+
+
+def dump_build(build):
+    reference = str(build.reference) if build.reference else None
+    return json.dumps({"settings": build.settings, "options": build.options, "env_vars": build.env_vars,
+                       "build_requires": build.build_requires, "reference": reference}, default=str)
+
+
+def load_build(text):
+    build = json.loads(text)
+    return build["settings"], build["options"], build["env_vars"], build["build_requires"], build["reference"]
+
+
+def run_parallel(builds, workers):
+    # every build is run by this script again, given as CONAN_OPENSSL_PARALLEL_BUILD with its settings,
+    # options, env vars, build requires and reference, in an isolated conan home sharing the download
+    # cache and the OpenSSL source cache
+    root = tools.get_env("CONAN_OPENSSL_PARALLEL_FOLDER",
+                         os.path.join(os.path.expanduser("~"), ".conan", "openssl-matrix"))
+    download_cache = os.path.join(root, "download-cache")
+    # global budgets: every make job takes a CPU and CONAN_OPENSSL_MEMORY_PER_JOB MB, split between the workers
+    cpus = tools.cpu_count()  # honours CONAN_CPU_COUNT
+    memory = tools.get_env("CONAN_OPENSSL_PARALLEL_MEMORY", available_memory_mb() or 0)
+    if memory:
+        cpus = max(1, min(cpus, memory // tools.get_env("CONAN_OPENSSL_MEMORY_PER_JOB", 512)))
+    workers = max(1, min(workers, len(builds), cpus))
+    cpus_per_worker = cpus // workers
+    print("running %d builds with %d workers, %d CPUs each" % (len(builds), workers, cpus_per_worker))
+
+    def run(index):
+        home = os.path.join(root, "job-%d" % (index + 1))
+        log_path = os.path.join(home, "build.log")
+        env = dict(os.environ)
+        env.update({"CONAN_USER_HOME": home,
+                    "CONAN_OPENSSL_PARALLEL_BUILD": dump_build(builds[index]),
+                    "CONAN_CPU_COUNT": str(cpus_per_worker)})
+        for name in ["CONAN_OPENSSL_PARALLEL_JOBS", "CONAN_TOTAL_PAGES", "CONAN_CURRENT_PAGE"]:
+            env.pop(name, None)
+        start = time.time()
+        if not os.path.isdir(home):
+            os.makedirs(home)
+        with open(log_path, "w") as log:
+            status = subprocess.call(["conan", "config", "set", "storage.download_cache=%s" % download_cache],
+                                     env=env, stdout=log, stderr=subprocess.STDOUT)
+            if status == 0:
+                status = subprocess.call([sys.executable, os.path.abspath(__file__)], env=env,
+                                         stdout=log, stderr=subprocess.STDOUT)
+        return index, status, time.time() - start, log_path
+
+    start = time.time()
+    durations = []
+    failures = []
+    pool = ThreadPool(workers)
+    for count, (index, status, duration, log_path) in enumerate(pool.imap_unordered(run, range(len(builds)))):
+        durations.append(duration)
+        result = "ok" if status == 0 else "FAILED"
+        print("[%d/%d] %s %s (%s), log: %s" % (count + 1, len(builds), result, describe(builds[index]),
+                                               format_duration(duration), log_path))
+        sys.stdout.flush()
+        if status != 0:
+            failures.append(describe(builds[index]))
+    pool.close()
+    pool.join()
+
+    wall_time = time.time() - start
+    print("%d builds, %d failed, wall time %s, serial sum %s (%.1fx)" %
+          (len(builds), len(failures), format_duration(wall_time), format_duration(sum(durations)),
+           sum(durations) / wall_time if wall_time else 1.0))
+    for failure in failures:
+        print("FAILED: %s" % failure)
+    return 1 if failures else 0
 
 
 if __name__ == "__main__":
     builder = ConanMultiPackager()
-    builder.add_common_builds(pure_c=True)
+    # CONAN_OPENSSL_PARALLEL_BUILD: set by run_parallel, the one build of this worker exactly as the parent
+    # planned it, rather than a page of a matrix generated again
+    worker_build = os.environ.get("CONAN_OPENSSL_PARALLEL_BUILD")
+    if worker_build:
+        builder.items = [load_build(worker_build)]
+    else:
+        builder.add_common_builds(pure_c=True)
+
+    # host paths don't exist in the docker containers, which get the CONAN_ variables as they are
+    if "CONAN_OPENSSL_SOURCE_CACHE" not in os.environ and not os.environ.get("CONAN_DOCKER_IMAGE"):
+        os.environ["CONAN_OPENSSL_SOURCE_CACHE"] = os.path.join(os.path.expanduser("~"), ".conan",
+                                                                "openssl-sources")
+    # CONAN_OPENSSL_COMPILER_LAUNCHER: compiler cache passed as compiler_launcher, a command name looked up
+    # on the PATH of the machine or container running the build
+    launcher = tools.get_env("CONAN_OPENSSL_COMPILER_LAUNCHER")
+    if launcher:
+        for build in builder.items:
+            build.options["OpenSSL:compiler_launcher"] = os.path.basename(launcher)
+    builder.items = sorted(builder.items, key=variant_key)
+
+    kept, collapsed = collapse_matrix(builder.items)
+    print("build matrix: %d cells, %d served by a compatible binary of another cell, %d to build" %
+          (len(builder.items), len(collapsed), len(kept)))
+    for build, fallback in collapsed:
+        print("    %s -> %s" % (describe(build), describe(fallback)))
+    # CONAN_OPENSSL_COLLAPSE_MATRIX: only build the cells no compatible binary stands in for
+    if tools.get_env("CONAN_OPENSSL_COLLAPSE_MATRIX", False):
+        builder.items = kept
+
+    # CONAN_OPENSSL_PARALLEL_JOBS: number of builds running at once on this machine
+    parallel_jobs = tools.get_env("CONAN_OPENSSL_PARALLEL_JOBS", 0)
+    if parallel_jobs > 1:
+        sys.exit(run_parallel(builder.items, parallel_jobs))
+
     builder.run()
 
     if is_azure_pipelines():
         from conans.client import conan_api
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ci"))
+        from evict_openssl import evict
 
         instance, _, _ = conan_api.Conan.factory()
-        instance.remove("*", force=True)
+        evict(instance, print)
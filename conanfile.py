@@ -1,14 +1,59 @@
 # -*- coding: utf-8 -*-
 import os
+import re
+import sys
+import json
+import time
+import socket
+import subprocess
+import zlib
+import hashlib
+import tarfile
+import shutil
+import operator
 import fnmatch
+import glob
+import posixpath
+from contextlib import contextmanager
 from functools import total_ordering
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 from conans.errors import ConanInvalidConfiguration, ConanException
 from conans import ConanFile, AutoToolsBuildEnvironment, tools
+from conans.model.version import Version
+from openssl_compatibility import compatible_compiler_versions
+
+# cpp_info.components, compatible_packages and self.info.clone()
+required_conan_version = ">=1.26.0"
 
 
 @total_ordering
 class OpenSSLVersion(object):
-    def __init__(self, version_str):
+    """immutable, interned version: OpenSSLVersion("1.1.1c") is OpenSSLVersion("1.1.1c")"""
+    __slots__ = ("_major", "_minor", "_patch", "_build", "_pre", "_key")
+    _interned = {}
+    _ranges = {}
+    _range_operators = (
+        (">=", operator.ge),
+        ("<=", operator.le),
+        ("!=", operator.ne),
+        ("==", operator.eq),
+        (">", operator.gt),
+        ("<", operator.lt),
+        ("=", operator.eq),
+    )
+
+    def __new__(cls, version_str):
+        version = cls._interned.get(version_str)
+        if version is None:
+            version = object.__new__(cls)
+            version._parse(version_str)
+            cls._interned[version_str] = version
+        return version
+
+    def _parse(self, version_str):
         self._pre = ""
 
         tokens = version_str.split("-")
@@ -27,16 +72,31 @@ class OpenSSLVersion(object):
                 self._patch = tokens[2]
                 if self._patch[-1].isalpha():
                     self._build = self._patch[-1]
-                    self._patch = self._patch[:1]
+                    self._patch = self._patch[:-1]
                 self._patch = int(self._patch)
+        self._key = (self._major, self._minor, self._patch, self._build, self._pre)
+
+    def __reduce__(self):
+        return OpenSSLVersion, (str(self),)
+
+    def __str__(self):
+        version = "%s%s" % (self.base, self._build)
+        return "%s-%s" % (version, self._pre) if self._pre else version
+
+    def __repr__(self):
+        return "OpenSSLVersion(%r)" % str(self)
 
     @property
     def base(self):
         return "%s.%s.%s" % (self._major, self._minor, self._patch)
 
+    @property
+    def sort_key(self):
+        return self._key
+
     @property
     def as_list(self):
-        return [self._major, self._minor, self._patch, self._build, self._pre]
+        return list(self._key)
 
     def __eq__(self, other):
         return self.compare(other) == 0
@@ -45,18 +105,112 @@ class OpenSSLVersion(object):
         return self.compare(other) == -1
 
     def __hash__(self):
-        return hash(self.as_list)
+        return hash(self._key)
 
     def compare(self, other):
         if not isinstance(other, OpenSSLVersion):
             other = OpenSSLVersion(other)
-        if self.as_list == other.as_list:
+        if self._key == other._key:
             return 0
-        elif self.as_list < other.as_list:
+        elif self._key < other._key:
             return -1
         else:
             return 1
 
+    @classmethod
+    def _parse_range(cls, spec):
+        constraints = cls._ranges.get(spec)
+        if constraints is None:
+            constraints = []
+            for token in spec.split():
+                for prefix, op in cls._range_operators:
+                    if token.startswith(prefix):
+                        constraints.append((op, OpenSSLVersion(token[len(prefix):])))
+                        break
+                else:
+                    constraints.append((operator.eq, OpenSSLVersion(token)))
+            constraints = tuple(constraints)
+            cls._ranges[spec] = constraints
+        return constraints
+
+    def in_range(self, spec):
+        # space separated constraints which must all hold, e.g. ">=1.1.0 <1.1.1"
+        return all(op(self._key, version._key) for op, version in self._parse_range(spec))
+
+
+class _HashingReader(object):
+    """file-like wrapper hashing every byte read from the stream, and copying it to tee when given"""
+
+    def __init__(self, stream, tee=None):
+        self._stream = stream
+        self._tee = tee
+        self._sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self._sha256.update(data)
+        if self._tee is not None:
+            self._tee.write(data)
+        return data
+
+    def drain(self):
+        while self.read(1024 * 1024):
+            pass
+
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+
+class _TargetIndex(object):
+    """compiled form of OpenSSLConan._targets: exact keys are hashed, wildcards keep declaration order"""
+
+    def __init__(self, targets):
+        self._exact = {}
+        self._wildcards = []
+        self._resolved = {}
+        for rank, (pattern, target) in enumerate(targets.items()):
+            if "*" in pattern or "?" in pattern or "[" in pattern:
+                self._wildcards.append((rank, pattern, target))
+            elif pattern not in self._exact:
+                self._exact[pattern] = (rank, target)
+
+    def resolve(self, query):
+        if query not in self._resolved:
+            # the first declared pattern wins, so a wildcard only beats an exact key if declared before it
+            rank, target = self._exact.get(query, (len(self._exact) + len(self._wildcards), None))
+            for wildcard_rank, pattern, wildcard_target in self._wildcards:
+                if wildcard_rank > rank:
+                    break
+                # fnmatch caches the compiled patterns, nothing is compiled for wildcards never reached
+                if fnmatch.fnmatch(query, pattern):
+                    target = wildcard_target
+                    break
+            self._resolved[query] = target
+        return self._resolved[query]
+
+
+# target indexes shared by every instance of the recipe, keyed by the inputs of OpenSSLConan._targets
+_target_indexes = {}
+
+
+# prepended to the build's copy of util/mkbuildinf.pl by reproducible builds: buildinf.h gets the SOURCE_DATE_EPOCH date, whatever the
+# version reads (localtime, gmtime or time), and the folders of the build replaced in the compiler flags
+REPRODUCIBLE_MKBUILDINF = r"""# conan: reproducible build information
+BEGIN {
+    if (defined $ENV{CONAN_OPENSSL_PREFIX_MAP} && defined $ENV{SOURCE_DATE_EPOCH}) {
+        *CORE::GLOBAL::time = sub () { $ENV{SOURCE_DATE_EPOCH} };
+        *CORE::GLOBAL::localtime = sub (;$) { CORE::gmtime(@_ ? $_[0] : $ENV{SOURCE_DATE_EPOCH}) };
+        *CORE::GLOBAL::gmtime = sub (;$) { CORE::gmtime(@_ ? $_[0] : $ENV{SOURCE_DATE_EPOCH}) };
+    }
+}
+if (defined $ENV{CONAN_OPENSSL_PREFIX_MAP}) {
+    foreach my $mapping (split /\n/, $ENV{CONAN_OPENSSL_PREFIX_MAP}) {
+        my ($folder, $placeholder) = split /=/, $mapping, 2;
+        s/\Q$folder\E/$placeholder/g foreach @ARGV;
+    }
+}
+"""
+
 
 class OpenSSLConan(ConanFile):
     name = "OpenSSL"
@@ -67,6 +221,7 @@ class OpenSSLConan(ConanFile):
     license = "OpenSSL"
     topics = ("conan", "openssl", "ssl", "tls", "encryption", "security")
     description = "A toolkit for the Transport Layer Security (TLS) and Secure Sockets Layer (SSL) protocols"
+    exports = "openssl_compatibility.py"
     options = {"no_threads": [True, False],
                "no_zlib": [True, False],
                "shared": [True, False],
@@ -91,12 +246,49 @@ class OpenSSLConan(ConanFile):
                "no_async": [True, False],
                "no_dso": [True, False],
                "capieng_dialog": [True, False],
-               "openssldir": "ANY"}
+               "openssldir": "ANY",
+               "compiler_launcher": "ANY",
+               "lto": [True, False],
+               "pgo": [True, False],
+               "march": [None, "native", "x86-64-v2", "x86-64-v3", "x86-64-v4", "armv8-a", "armv8.2-a", "armv8.4-a"],
+               "strip": [True, False],
+               "no_cli": [True, False],
+               "libraries_only": [True, False],
+               "minimization": [None, "client-only", "tls13-server-minimal"],
+               "features": "ANY",
+               "performance_features": [True, False],
+               "fast_load": [None, "lazy", "now"],
+               "reproducible": [True, False]}
     default_options = {key: False for key in options.keys()}
     default_options["fPIC"] = True
     default_options["openssldir"] = None
+    default_options["compiler_launcher"] = None
+    default_options["march"] = None
+    default_options["minimization"] = None
+    default_options["features"] = None
+    default_options["fast_load"] = None
     _env_build = None
+    _build_profile = None
+    _pgo_stage = None
+    # recipe options which are not passed to Configure as no-xxx
+    _non_configure_options = ["fPIC", "openssldir", "capieng_dialog", "compiler_launcher", "lto", "pgo",
+                              "march", "strip", "no_cli", "libraries_only", "minimization", "features",
+                              "performance_features", "fast_load", "reproducible"]
+    # Configure flags of the minimization profiles, with the first version supporting all of them
+    _minimization_profiles = {
+        "client-only": ("1.1.0", ["no-ssl3", "no-ssl3-method", "no-dtls", "no-srp", "no-psk", "no-srtp",
+                                  "no-comp", "no-engine", "no-idea", "no-seed", "no-rc2", "no-rc4", "no-md4",
+                                  "no-mdc2", "no-whirlpool", "no-camellia", "no-bf", "no-cast"]),
+        "tls13-server-minimal": ("1.1.1", ["no-ssl3", "no-ssl3-method", "no-tls1", "no-tls1-method", "no-tls1_1",
+                                           "no-tls1_1-method", "no-tls1_2", "no-tls1_2-method", "no-dtls",
+                                           "no-srp", "no-psk", "no-srtp", "no-nextprotoneg", "no-ct", "no-comp",
+                                           "no-engine", "no-idea", "no-seed", "no-rc2", "no-rc4", "no-md4",
+                                           "no-mdc2", "no-whirlpool", "no-camellia", "no-bf", "no-cast",
+                                           "no-aria", "no-sm2", "no-sm3", "no-sm4", "no-dsa"])
+    }
     _source_subfolder = "sources"
+    # reproducible builds are configured for these locations, independent of the conan cache
+    _reproducible_prefix = "/conan/openssl"
 
     def build_requirements(self):
         # useful for example for conditional build_requires
@@ -122,6 +314,52 @@ class OpenSSLConan(ConanFile):
     def _full_version(self):
         return OpenSSLVersion(self.version)
 
+    @property
+    def _configure_features(self):
+        features = []
+        if self.options.minimization:
+            features.extend(self._minimization_profiles[str(self.options.minimization)][1])
+        if self.options.features:
+            for feature in re.split(r"[\s,]+", str(self.options.features).strip()):
+                if not re.match(r"^(no|enable)-[a-z0-9_\-]+$", feature):
+                    raise ConanInvalidConfiguration("features: %s is not a no-xxx or enable-xxx flag" % feature)
+                features.append(feature)
+        return sorted(set(features))
+
+    @property
+    def _performance_features(self):
+        # opt-in code paths which are faster than the defaults, where the target and the compiler support them
+        features = []
+        if not self.options.performance_features:
+            return features
+        # from the settings and options only, package_id() relies on it
+        target = re.sub(r"^debug-", "", self._settings_target or "")
+        # constant time P-224/P-256/P-521, needs a little endian 64-bit target and a compiler with __uint128_t
+        if self.settings.compiler in ["gcc", "clang", "apple-clang"] and not self._use_nmake and \
+                self.settings.arch in ["x86_64", "armv8", "armv8.3", "ppc64le"] and \
+                not target.startswith("VC-") and "32" not in target:
+            features.append("enable-ec_nistp_64_gcc_128")
+        return features
+
+    @property
+    def _out_of_source(self):
+        # 1.1.0 still patches Makefile.shared, which is read from the source tree
+        return self._full_version >= "1.1.1"
+
+    @property
+    def no_copy_source(self):
+        return self._out_of_source
+
+    @property
+    def _build_subfolder(self):
+        return "build" if self._out_of_source else self._source_subfolder
+
+    @property
+    def _config_folder(self):
+        # out of source, the target is kept next to the build and found through OPENSSL_LOCAL_CONFIG_DIR
+        return "conan-configurations" if self._out_of_source else os.path.join(self._source_subfolder,
+                                                                              "Configurations")
+
     def source(self):
         sha256 = {
             "1.0.2": "8c48baf3babe0d505d16cfc0cf272589c66d3624264098213db0fb00034728e9",
@@ -161,19 +399,245 @@ class OpenSSLConan(ConanFile):
             "1.1.1b": "5c557b023230413dfb0756f3137a13e6d726838ccd1430888ad15bfb2b43ea4b",
             "1.1.1c": "f6fb3079ad15076154eda9413fed42877d668e7069d9b87396d0804fdb3f4c90",
         }
+        self._get_tarball(sha256[self.version])
+
+    @property
+    def _source_mirrors(self):
+        # CONAN_OPENSSL_MIRRORS: ";" separated base urls, tried in order before the official ones
+        mirrors = [m for m in tools.get_env("CONAN_OPENSSL_MIRRORS", "").split(";") if m]
+        mirrors.extend(["https://www.openssl.org/source/",
+                        "https://www.openssl.org/source/old/%s/" % self._full_version.base])
+        return [m if m.endswith("/") else m + "/" for m in mirrors]
+
+    @property
+    def _source_cache_folder(self):
+        # CONAN_OPENSSL_SOURCE_CACHE: tarball store shared between workspaces, addressed by sha256
+        return tools.get_env("CONAN_OPENSSL_SOURCE_CACHE")
+
+    def _get_tarball(self, sha256):
+        filename = "openssl-%s.tar.gz" % self.version
+        cache_folder = self._source_cache_folder
+        cached = os.path.join(cache_folder, "%s.tar.gz" % sha256) if cache_folder else None
+        if cached and os.path.isfile(cached):
+            self.output.info("using cached tarball: %s" % cached)
+            try:
+                with open(cached, "rb") as tarball:
+                    self._extract_verified(tarball, sha256)
+            except (ConanException, EnvironmentError, tarfile.TarError, zlib.error) as e:
+                self.output.warn("removing corrupted cached tarball %s: %s" % (cached, e))
+                os.unlink(cached)
+            else:
+                os.utime(cached, None)  # mtime is the LRU clock
+                return
+        if tools.get_env("CONAN_OPENSSL_OFFLINE", False):
+            raise ConanException("%s is not in the source cache (%s) and CONAN_OPENSSL_OFFLINE is set" %
+                                 (filename, cache_folder))
+
+        if cached and not os.path.isdir(cache_folder):
+            os.makedirs(cache_folder)
+        # written under a unique name first, so concurrent builds never see a partial tarball
+        staging = "%s.%s.part" % (cached, os.getpid()) if cached else None
+        for mirror in self._source_mirrors:
+            url = mirror + filename
+            self.output.info("downloading %s" % url)
+            try:
+                self._stream_tarball(url, sha256, staging)
+            except (ConanException, EnvironmentError, tarfile.TarError, zlib.error) as e:
+                self.output.warn("failed to get %s: %s" % (url, e))
+                if staging and os.path.isfile(staging):
+                    os.unlink(staging)
+                continue
+            if cached:
+                self._store_in_source_cache(staging, cached)
+            return
+        raise ConanException("could not download %s from any mirror" % filename)
+
+    def _stream_tarball(self, url, sha256, staging):
+        # a single pass over the response: hashed, extracted and, with a source cache, written to staging
+        _, requester = tools.get_global_instances()
+        # conan's requester: the proxies, cacert, client certificates and timeout of conan.conf
+        response = requester.get(url, stream=True, verify=True)
+        tee = None
+        try:
+            if not response.ok:
+                raise ConanException("HTTP %s" % response.status_code)
+            response.raw.decode_content = False  # the bytes of the tarball, whatever the Content-Encoding
+            tee = open(staging, "wb") if staging else None
+            self._extract_verified(response.raw, sha256, tee=tee)
+        finally:
+            if tee:
+                tee.close()
+            response.close()
+
+    @staticmethod
+    def _check_member(member):
+        # every member is checked, tarfile's extraction filters only exist in recent Python releases
+        def absolute(path):
+            return posixpath.isabs(path) or re.match(r"^([A-Za-z]:|\\\\)", path) is not None
+
+        def escapes(path):
+            return absolute(path) or ".." in path.replace("\\", "/").split("/")
+
+        if escapes(member.name):
+            raise ConanException("refusing to extract %s" % member.name)
+        if member.issym():
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(member.name), member.linkname))
+            if absolute(member.linkname) or target.split("/")[0] == "..":
+                raise ConanException("refusing to extract %s -> %s" % (member.name, member.linkname))
+        elif member.islnk():
+            if escapes(member.linkname):
+                raise ConanException("refusing to extract %s, hard link to %s" % (member.name, member.linkname))
+        elif not member.isfile() and not member.isdir():
+            raise ConanException("refusing to extract %s, not a regular file" % member.name)
+        member.mode &= 0o755  # no setuid, setgid or group/world writable files
+
+    def _extract_verified(self, stream, sha256, tee=None):
+        # hash and untar the tarball in a single pass over the stream,
+        # the sources only show up in _source_subfolder once the checksum matched
+        prefix = "openssl-%s/" % self.version
+        extracting = "%s.%s.part" % (self._source_subfolder, os.getpid())
+        extract_kwargs = {"filter": "tar"} if hasattr(tarfile, "tar_filter") else {}
+        # the symbolic links of the 1.0.x tarballs (include/openssl) are copied on Windows, where creating them
+        # needs a privilege: tarfile's own fallback reads the target again, which a stream can't seek back to
+        copy_links = tools.os_info.is_windows
+        links = []
+        try:
+            reader = _HashingReader(stream, tee)
+            with tarfile.open(fileobj=reader, mode="r|gz") as tar:
+                for member in tar:
+                    if not member.name.startswith(prefix):
+                        continue
+                    member.name = member.name[len(prefix):]
+                    if member.islnk():
+                        if not member.linkname.startswith(prefix):
+                            raise ConanException("refusing to extract %s, hard link to %s"
+                                                 % (member.name, member.linkname))
+                        member.linkname = member.linkname[len(prefix):]
+                    self._check_member(member)
+                    if member.issym() and copy_links:
+                        links.append(member)
+                        continue
+                    tar.extract(member, extracting, **extract_kwargs)
+            reader.drain()  # tar stops reading at its end-of-archive marker
+            if reader.hexdigest() != sha256:
+                raise ConanException("sha256 mismatch: expected %s, got %s" % (sha256, reader.hexdigest()))
+            self._copy_links(links, extracting)
+            os.rename(extracting, self._source_subfolder)
+        except BaseException:
+            tools.rmdir(extracting)
+            raise
+
+    @staticmethod
+    def _copy_links(links, folder):
+        # in rounds, as a link may point to another link not copied yet
+        while links:
+            pending = []
+            for member in links:
+                path = os.path.join(folder, member.name)
+                target = os.path.join(folder, posixpath.normpath(posixpath.join(posixpath.dirname(member.name),
+                                                                                member.linkname)))
+                if not os.path.exists(target):
+                    pending.append(member)
+                    continue
+                if not os.path.isdir(os.path.dirname(path)):
+                    os.makedirs(os.path.dirname(path))
+                if os.path.isdir(target):
+                    shutil.copytree(target, path)
+                else:
+                    shutil.copy2(target, path)
+            if len(pending) == len(links):
+                raise ConanException("unresolved symbolic links: %s" % ", ".join(m.name for m in pending))
+            links = pending
+
+    def _store_in_source_cache(self, staging, cached):
         try:
-            url = "https://www.openssl.org/source/openssl-%s.tar.gz" % self.version
-            tools.get(url, sha256=sha256[self.version])
-        except ConanException:
-            url = url.replace("https://www.openssl.org/source/",
-                              "https://www.openssl.org/source/old/%s" % self._full_version.base)
-            tools.get(url, sha256=sha256[self.version])
-        extracted_folder = "openssl-" + self.version
-        os.rename(extracted_folder, self._source_subfolder)
+            os.rename(staging, cached)
+        except OSError:
+            os.unlink(staging)  # another build stored the same content meanwhile
+        self._evict_source_cache(os.path.dirname(cached), keep=cached)
+
+    def _evict_source_cache(self, cache_folder, keep):
+        # CONAN_OPENSSL_SOURCE_CACHE_SIZE: budget in MB, least recently used tarballs go first
+        budget = int(tools.get_env("CONAN_OPENSSL_SOURCE_CACHE_SIZE", 0)) * 1024 * 1024
+        if not budget:
+            return
+        entries = []
+        for filename in os.listdir(cache_folder):
+            path = os.path.join(cache_folder, filename)
+            if filename.endswith(".tar.gz") and os.path.isfile(path):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= budget:
+                break
+            if path == keep:
+                continue
+            self.output.info("evicting cached tarball: %s" % path)
+            try:
+                os.unlink(path)
+            except OSError:
+                continue  # already evicted by a concurrent build
+            total -= size
 
     def configure(self):
         del self.settings.compiler.libcxx
         del self.settings.compiler.cppstd
+        if self.options.lto or self.options.pgo:
+            if self.settings.compiler not in ["gcc", "clang"] or self.settings.os == "Windows":
+                raise ConanInvalidConfiguration("lto and pgo are only supported with gcc and clang")
+        if self.options.pgo:
+            if self.settings.os != "Linux" or self._full_version < "1.1.1" or tools.cross_building(self.settings):
+                raise ConanInvalidConfiguration("pgo is only supported for native Linux builds of 1.1.1 or later")
+        march = str(self.options.march) if self.options.march else None
+        if march:
+            if march.startswith("x86-64") and self.settings.arch != "x86_64":
+                raise ConanInvalidConfiguration("march=%s requires arch=x86_64" % march)
+            if march.startswith("armv8") and self.settings.arch not in ["armv8", "armv8.3"]:
+                raise ConanInvalidConfiguration("march=%s requires arch=armv8" % march)
+            if march == "native" and tools.cross_building(self.settings):
+                raise ConanInvalidConfiguration("march=native can't be used when cross building")
+            if self._use_nmake and (march not in ["x86-64-v3", "x86-64-v4"] or self._full_version < "1.1.0"):
+                raise ConanInvalidConfiguration("march=%s is not supported with %s" % (march, self.settings.compiler))
+            # the x86-64 microarchitecture levels came with gcc 11 and clang 12 (Xcode 13)
+            minimum = {"gcc": "11", "clang": "12", "apple-clang": "13.0"}.get(str(self.settings.compiler))
+            if march.startswith("x86-64-v") and minimum and Version(str(self.settings.compiler.version)) < minimum:
+                raise ConanInvalidConfiguration("march=%s requires %s %s or later"
+                                                % (march, self.settings.compiler, minimum))
+        if self.options.libraries_only:
+            if self.options.pgo:
+                raise ConanInvalidConfiguration("pgo trains with the openssl app, which libraries_only doesn't build")
+            # 1.1.0 installs the DLLs together with the apps (install_runtime)
+            if self.options.shared and self.settings.os == "Windows" and "1.1.0" <= self._full_version < "1.1.1":
+                raise ConanInvalidConfiguration("libraries_only requires 1.1.1 or later for shared Windows builds")
+        if self.options.minimization:
+            min_version, _ = self._minimization_profiles[str(self.options.minimization)]
+            if self._full_version < min_version:
+                raise ConanInvalidConfiguration("minimization=%s requires %s or later"
+                                                % (self.options.minimization, min_version))
+        features = self._configure_features  # validates the flags
+        for feature in features:
+            if feature.startswith("enable-") and "no-" + feature[7:] in features:
+                raise ConanInvalidConfiguration("features: both %s and no-%s are requested" % (feature, feature[7:]))
+        if self.options.fast_load:
+            if not self.options.shared:
+                raise ConanInvalidConfiguration("fast_load only applies to shared=True")
+            if self.settings.os not in ["Linux", "Android", "FreeBSD"] or self._use_nmake:
+                raise ConanInvalidConfiguration("fast_load requires an ELF target with a GNU compatible linker")
+        if self.options.reproducible:
+            if self._use_nmake:
+                raise ConanInvalidConfiguration("reproducible requires gcc, clang or apple-clang")
+            if self.options.pgo:
+                raise ConanInvalidConfiguration("pgo profiles are collected per build folder, they aren't "
+                                                "reproducible")
+            if not self._supports_file_prefix_map:
+                self.output.warn("%s %s has no -ffile-prefix-map, __FILE__ keeps the build folders"
+                                 % (self.settings.compiler, self.settings.compiler.version))
+        if self.options.performance_features:
+            for feature in ["enable-ec_nistp_64_gcc_128"]:
+                if feature not in self._performance_features:
+                    self.output.warn("%s isn't supported by %s with %s, skipping it"
+                                     % (feature, self._ancestor_target, self.settings.compiler))
 
     def config_options(self):
         if self.settings.os != "Windows":
@@ -181,6 +645,41 @@ class OpenSSLConan(ConanFile):
         else:
             del self.options.fPIC
 
+    def package_id(self):
+        # the launcher only speeds up the build, the binaries are the same
+        del self.info.options.compiler_launcher
+        # a profile and the flags it expands to give the same binaries
+        self.info.options.features = " ".join(self._configure_features) or None
+        del self.info.options.minimization
+        # nothing changes where none of the features is supported
+        self.info.options.performance_features = bool(self._performance_features)
+        self._add_compatible_packages()
+
+    def _add_compatible_packages(self):
+        # fallback binaries, tried in order when the exact package_id is missing: static PIC libraries link
+        # into non PIC consumers, and C binaries of an older compiler in an ABI stable range into newer ones
+        pic_fallback = not self.options.shared and self.options.get_safe("fPIC") is not None and \
+            not self.options.fPIC
+        known_versions = self.settings.compiler.version.values_range
+        # LTO objects are only understood by the compiler version which wrote them
+        if self.options.lto or not isinstance(known_versions, list):
+            versions = []
+        else:
+            versions = compatible_compiler_versions(self.settings.compiler, self.settings.compiler.version,
+                                                    known_versions)
+        candidates = [(None, True)] if pic_fallback else []
+        for version in versions:
+            candidates.append((version, None))
+            if pic_fallback:
+                candidates.append((version, True))
+        for version, fpic in candidates:
+            compatible = self.info.clone()
+            if version:
+                compatible.settings.compiler.version = version
+            if fpic:
+                compatible.options.fPIC = True
+            self.compatible_packages.append(compatible)
+
     def requirements(self):
         if not self.options.no_zlib:
             self.requires("zlib/1.2.11@conan/stable")
@@ -307,12 +806,24 @@ class OpenSSLConan(ConanFile):
             "Neutrino-*-*": "BASE_unix",
         }
 
+    @property
+    def _target_index(self):
+        key = (self._full_version < "1.1.0", self._target_prefix, self.settings.get_safe("os.subsystem") == "cygwin")
+        if key not in _target_indexes:
+            _target_indexes[key] = _TargetIndex(self._targets)
+        return _target_indexes[key]
+
+    @property
+    def _settings_target(self):
+        # the target the settings select, CONAN_OPENSSL_CONFIGURATION isn't part of the package_id
+        query = "%s-%s-%s" % (self.settings.os, self.settings.arch, self.settings.compiler)
+        return self._target_index.resolve(query)
+
     @property
     def _ancestor_target(self):
         if "CONAN_OPENSSL_CONFIGURATION" in os.environ:
             return os.environ["CONAN_OPENSSL_CONFIGURATION"]
-        query = "%s-%s-%s" % (self.settings.os, self.settings.arch, self.settings.compiler)
-        ancestor = next((self._targets[i] for i in self._targets if fnmatch.fnmatch(query, i)), None)
+        ancestor = self._settings_target
         if not ancestor:
             raise ConanInvalidConfiguration("unsupported configuration: %s %s %s, "
                                             "please open an issue: "
@@ -336,6 +847,11 @@ class OpenSSLConan(ConanFile):
         # https://wiki.openssl.org/index.php/Compilation_and_Installation#Modifying_Build_Settings
         # its often easier to modify Configure and Makefile.org rather than trying to add targets to the configure scripts
         makefile_org = os.path.join(self._source_subfolder, "Makefile.org")
+        # keep the pristine file around, so a changed configuration patches it again from scratch
+        if os.path.isfile(makefile_org + ".orig"):
+            shutil.copy2(makefile_org + ".orig", makefile_org)
+        else:
+            shutil.copy2(makefile_org, makefile_org + ".orig")
         env_build = self._get_env_build()
         with tools.environment_append(env_build.vars):
             cc = os.environ.get("CC", "cc")
@@ -361,13 +877,230 @@ class OpenSSLConan(ConanFile):
                 if self.settings.get_safe("os.version"):
                     self._env_build.flags.append(tools.apple_deployment_target_flag(self.settings.os,
                                                                               self.settings.os.version))
+            optimization_flags = []
+            self._env_build.flags.extend(self._march_flags)
+            self._env_build.flags.extend(self._profiling_flags)
+            self._env_build.flags.extend(self._reproducible_flags)
+            self._env_build.link_flags.extend(self._fast_load_flags)
+            if self.options.get_safe("lto"):
+                optimization_flags.append("-flto")
+            if self._pgo_stage == "generate":
+                optimization_flags.append("-fprofile-generate=%s" % self._pgo_folder)
+            elif self._pgo_stage == "use":
+                if self.settings.compiler == "gcc":
+                    optimization_flags.extend(["-fprofile-use=%s" % self._pgo_folder, "-fprofile-correction",
+                                               "-Wno-missing-profile"])
+                else:
+                    optimization_flags.append("-fprofile-use=%s" % os.path.join(self._pgo_folder, "merged.profdata"))
+            self._env_build.flags.extend(optimization_flags)
+            self._env_build.link_flags.extend(optimization_flags)
         return self._env_build
 
+    @property
+    def _fast_load_flags(self):
+        # fewer and cheaper relocations when libssl and libcrypto are loaded, binding at the first call or at load
+        fast_load = self.options.get_safe("fast_load")
+        if not fast_load:
+            return []
+        flags = ["-Wl,-O1", "-Wl,-Bsymbolic-functions", "-Wl,-z,%s" % fast_load]
+        if not str(self.settings.arch).startswith("mips"):
+            flags.append("-Wl,--hash-style=gnu")  # MIPS has no DT_GNU_HASH
+        return flags
+
+    @property
+    def _profiling_flags(self):
+        # RelWithDebInfo is the profiling variant: full optimization with the frame pointers kept and debug
+        # information, so that sampling profilers unwind through libcrypto. the perlasm modules of 1.1.1 emit
+        # their .cfi directives on their own, 1.0.x has none and some of its assembly uses the frame pointer
+        # register for data
+        if self.settings.build_type != "RelWithDebInfo":
+            return []
+        if self._use_nmake:
+            return ["/Oy-"] if self.settings.arch == "x86" else []
+        flags = ["-O3", "-g", "-fno-omit-frame-pointer", "-fasynchronous-unwind-tables"]
+        if self.settings.arch in ["x86", "x86_64", "armv8"]:
+            flags.append("-mno-omit-leaf-frame-pointer")
+        return flags
+
+    @property
+    def _supports_file_prefix_map(self):
+        minimum = {"gcc": "8", "clang": "10", "apple-clang": "12.0"}.get(str(self.settings.compiler))
+        return minimum is not None and Version(str(self.settings.compiler.version)) >= minimum
+
+    @property
+    def _prefix_map(self):
+        # the folders of this build and of its dependencies, replaced by fixed ones in the binaries
+        if not self.options.reproducible:
+            return []
+        folders = [(self.build_folder, "/conan/build"), (self.source_folder, "/conan/source")]
+        folders.extend((self.deps_cpp_info[dep].rootpath, "/conan/deps/%s" % dep) for dep in self.deps_cpp_info.deps)
+        prefix_map = []
+        for folder, placeholder in folders:
+            if folder not in [mapped for mapped, _ in prefix_map]:
+                prefix_map.append((folder, placeholder))
+        return prefix_map
+
+    @property
+    def _reproducible_flags(self):
+        # -ffile-prefix-map covers the debug information and __FILE__, -fdebug-prefix-map only the former
+        flag = "-ffile-prefix-map" if self._supports_file_prefix_map else "-fdebug-prefix-map"
+        return ["%s=%s=%s" % (flag, folder, placeholder) for folder, placeholder in self._prefix_map]
+
+    @property
+    def _reproducible_env(self):
+        env_vars = {"CONAN_OPENSSL_PREFIX_MAP": "\n".join("%s=%s" % mapping for mapping in self._prefix_map)}
+        if "SOURCE_DATE_EPOCH" not in os.environ:
+            # the date of the release, the tarball extraction keeps the modification times
+            configure = os.path.join(self.source_folder, self._source_subfolder, "Configure")
+            env_vars["SOURCE_DATE_EPOCH"] = str(int(os.path.getmtime(configure)))
+        if tools.is_apple_os(self.settings.os):
+            env_vars["ZERO_AR_DATE"] = "1"  # no timestamps in the static libraries
+        launcher = self._compiler_launcher
+        if launcher and os.path.splitext(os.path.basename(launcher))[0] == "ccache":
+            # relative paths in the hashed command lines, and the prefix maps left out of the hash (ccache 4),
+            # so that builds in other folders hit the cache
+            if "CCACHE_BASEDIR" not in os.environ:
+                env_vars["CCACHE_BASEDIR"] = os.path.dirname(os.path.commonprefix([self.build_folder + os.sep,
+                                                                                   self.source_folder + os.sep]))
+            if "CCACHE_IGNOREOPTIONS" not in os.environ:
+                env_vars["CCACHE_IGNOREOPTIONS"] = "-ffile-prefix-map=* -fdebug-prefix-map=*"
+        return env_vars
+
+    def _patch_mkbuildinf(self):
+        # the sources are shared by every build of 1.1.1 (no_copy_source), so the makefiles generating buildinf.h
+        # are pointed at a patched copy of the script in the build folder
+        script = tools.load(os.path.join(self.source_folder, self._source_subfolder, "util", "mkbuildinf.pl"))
+        # after the #! line, ahead of the code reading the arguments
+        shebang, rest = script.split("\n", 1) if script.startswith("#!") else ("", script)
+        mkbuildinf = os.path.join(self.build_folder, "conan-mkbuildinf.pl")
+        tools.save(mkbuildinf, "\n".join(part for part in [shebang, REPRODUCIBLE_MKBUILDINF + rest] if part))
+        mkbuildinf = tools.unix_path(mkbuildinf) if self._win_bash else mkbuildinf.replace("\\", "/")
+        # the top level Makefile generates it since 1.1.0, crypto/Makefile before
+        makefile = "Makefile" if self._full_version >= "1.1.0" else os.path.join("crypto", "Makefile")
+        content = tools.load(makefile)
+        # a reconfigured 1.0.x build already runs the copy
+        patched = re.sub(r"[^\s\"]*(util[/\\]|conan-)mkbuildinf\.pl", lambda _: mkbuildinf, content)
+        if mkbuildinf not in patched:
+            raise ConanException("%s doesn't run util/mkbuildinf.pl, buildinf.h can't be made reproducible" % makefile)
+        tools.save(makefile, patched)
+
+    @property
+    def _install_staging(self):
+        return os.path.join(self.build_folder, "conan-install")
+
+    @property
+    def _install_variables(self):
+        # reproducible builds are configured for fixed locations and installed through DESTDIR
+        if not self.options.reproducible:
+            return {}
+        staging = tools.unix_path(self._install_staging) if self._win_bash else self._install_staging
+        return {"INSTALL_PREFIX" if self._full_version < "1.1.0" else "DESTDIR": staging}
+
+    def _move_staged_install(self):
+        if not self.options.reproducible:
+            return
+        installed = os.path.join(self._install_staging, self._reproducible_prefix.lstrip("/"))
+        for root, _, files in os.walk(installed):
+            folder = os.path.join(self.package_folder, os.path.relpath(root, installed))
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            for filename in files:
+                os.rename(os.path.join(root, filename), os.path.join(folder, filename))
+        tools.rmdir(self._install_staging)
+
+    @property
+    def _march_flags(self):
+        march = self.options.get_safe("march")
+        if not march:
+            return []
+        if self._use_nmake:
+            return ["/arch:AVX2" if march == "x86-64-v3" else "/arch:AVX512"]
+        return ["-march=%s" % march]
+
+    @property
+    def _lto_tools(self):
+        # static libraries of LTO objects need the archiver plugin of the compiler
+        if self.settings.compiler == "gcc":
+            tools_vars = {"AR": "gcc-ar", "RANLIB": "gcc-ranlib"}
+        else:
+            tools_vars = {"AR": "llvm-ar", "RANLIB": "llvm-ranlib"}
+        return {name: tool for name, tool in tools_vars.items() if name not in os.environ and tools.which(tool)}
+
+    @property
+    def _pgo_folder(self):
+        return os.path.join(self.build_folder, "pgo-profile")
+
+    def _pgo_train(self):
+        # exercise the hot paths of a TLS terminator: bulk ciphers, digests, key exchange and handshakes
+        openssl = "util/shlib_wrap.sh apps/openssl"
+        self._run("%s speed -seconds 1 -bytes 16384 -evp aes-128-gcm" % openssl, phase="pgo speed aes-128-gcm")
+        self._run("%s speed -seconds 1 -bytes 16384 -evp chacha20-poly1305" % openssl,
+                  phase="pgo speed chacha20-poly1305")
+        self._run("%s speed -seconds 1 sha256 rsa2048 ecdhp256 ecdsap256 ecdhx25519" % openssl,
+                  phase="pgo speed public key")
+        self._run("%s req -x509 -newkey rsa:2048 -nodes -keyout pgo-key.pem -out pgo-cert.pem -days 1 "
+                  "-subj /CN=localhost -config %s" % (openssl, os.path.join(self.source_folder, self._source_subfolder,
+                                                                             "apps", "openssl.cnf")),
+                  phase="pgo certificate")
+
+        handshakes = 50
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        with open(os.devnull, "r+") as devnull:
+            # -naccept lets the server exit normally, which is what writes its profile,
+            # the extra connection is the readiness probe
+            server = subprocess.Popen(openssl.split() + ["s_server", "-accept", str(port), "-naccept",
+                                                         str(3 * handshakes + 1), "-cert", "pgo-cert.pem",
+                                                         "-key", "pgo-key.pem", "-quiet"],
+                                      stdin=devnull, stdout=devnull, stderr=devnull)
+            try:
+                self._wait_for_port(port)
+                with self._profiled("pgo handshakes"):
+                    client = "%s s_client -connect 127.0.0.1:%s" % (openssl, port)
+                    for i in range(handshakes):
+                        self.run("%s < %s" % (client, os.devnull), output=False)
+                        # s_client quits at EOF on stdin, before a TLS 1.3 session ticket arrives, so
+                        # -sess_out would write nothing: the resumed handshakes are TLS 1.2 ones
+                        self.run("%s -tls1_2 -sess_out pgo-session.pem < %s" % (client, os.devnull), output=False)
+                        self.run("%s -tls1_2 -sess_in pgo-session.pem < %s" % (client, os.devnull), output=False)
+                deadline = time.time() + 30
+                while server.poll() is None and time.time() < deadline:
+                    time.sleep(0.1)
+            finally:
+                if server.poll() is None:
+                    self.output.warn("s_server did not exit, its profile is lost")
+                    server.kill()
+
+        if self.settings.compiler == "clang":
+            self._run("llvm-profdata merge -output=%s %s" % (os.path.join(self._pgo_folder, "merged.profdata"),
+                                                              os.path.join(self._pgo_folder, "*.profraw")),
+                      phase="pgo merge")
+
+    @staticmethod
+    def _wait_for_port(port, timeout=30):
+        deadline = time.time() + timeout
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return
+            except socket.error:
+                if time.time() > deadline:
+                    raise ConanException("s_server did not start listening on port %s" % port)
+                time.sleep(0.1)
+
     @property
     def _configure_args(self):
-        openssldir = self.options.openssldir if self.options.openssldir else os.path.join(self.package_folder, "res")
-        prefix = tools.unix_path(self.package_folder) if self._win_bash else self.package_folder
-        openssldir = tools.unix_path(openssldir) if self._win_bash else openssldir
+        if self.options.reproducible:
+            # the compiled in locations don't depend on the package folder, see package_info
+            prefix = self._reproducible_prefix
+            openssldir = self.options.openssldir if self.options.openssldir else prefix + "/res"
+        else:
+            openssldir = self.options.openssldir if self.options.openssldir else os.path.join(self.package_folder,
+                                                                                              "res")
+            prefix = tools.unix_path(self.package_folder) if self._win_bash else self.package_folder
+            openssldir = tools.unix_path(openssldir) if self._win_bash else openssldir
         args = ['"%s"' % (self._target if self._full_version >= "1.1.0" else self._ancestor_target),
                 "shared" if self.options.shared else "no-shared",
                 "--prefix=%s" % prefix,
@@ -375,7 +1108,7 @@ class OpenSSLConan(ConanFile):
                 "no-unit-test"]
         if self._full_version >= "1.1.1":
             args.append("PERL=%s" % self._perl)
-        if self._full_version < "1.1.0" or self._full_version >= "1.1.1":
+        if not self._full_version.in_range(">=1.1.0 <1.1.1"):
             args.append("no-tests")
         if self._full_version >= "1.1.0":
             args.append("--debug" if self.settings.build_type == "Debug" else "--release")
@@ -389,6 +1122,9 @@ class OpenSSLConan(ConanFile):
                 args.append("-DOPENSSL_CAPIENG_DIALOG=1")
         else:
             args.append("-fPIC" if self.options.fPIC else "")
+        if self._full_version < "1.1.0":
+            # Makefile.org has no lflags, Configure adds -Wl, arguments to the libraries linked with
+            args.extend(self._fast_load_flags)
 
         if "zlib" in self.deps_cpp_info.deps:
             zlib_info = self.deps_cpp_info["zlib"]
@@ -406,12 +1142,16 @@ class OpenSSLConan(ConanFile):
 
         for option_name in self.options.values.fields:
             activated = getattr(self.options, option_name)
-            if activated and option_name not in ["fPIC", "openssldir", "capieng_dialog"]:
+            if activated and option_name not in self._non_configure_options:
                 self.output.info("activated option: %s" % option_name)
                 args.append(option_name.replace("_", "-"))
+        for feature in self._configure_features + self._performance_features:
+            self.output.info("activated feature: %s" % feature)
+            args.append(feature)
         return args
 
-    def _create_targets(self):
+    @property
+    def _target_config(self):
         config_template = """{targets} = (
     "{target}" => {{
         inherit_from => [ "{ancestor}" ],
@@ -438,6 +1178,8 @@ class OpenSSLConan(ConanFile):
         cxx = self._tool("CXX", "cxx")
         ar = self._tool("AR", "ar")
         ranlib = self._tool("RANLIB", "ranlib")
+        if self._compiler_launcher:
+            cc = "%s %s" % (self._compiler_launcher, cc or self._cc)
 
         cc = 'cc => "%s",' % cc if cc else ""
         cxx = 'cxx => "%s",' % cxx if cxx else ""
@@ -462,15 +1204,22 @@ class OpenSSLConan(ConanFile):
                                         defines=defines,
                                         includes=includes,
                                         lflags=" ".join(env_build.link_flags))
+        return config
+
+    def _create_targets(self):
+        config = self._target_config
         self.output.info("using target: %s -> %s" % (self._target, self._ancestor_target))
         self.output.info(config)
 
-        tools.save(os.path.join(self._source_subfolder, "Configurations", "20-conan.conf"), config)
+        tools.save(os.path.join(self._config_folder, "20-conan.conf"), config)
 
-    def _run_make(self, targets=None, makefile=None, parallel=True):
+    def _run_make(self, targets=None, makefile=None, parallel=True, variables=None):
         command = [self._make_program]
         if makefile:
             command.extend(["-f", makefile])
+        if variables:
+            command.extend(('%s="%s"' if " " in value else "%s=%s") % (name, value)
+                           for name, value in sorted(variables.items()))
         if targets:
             command.extend(targets)
         if not self._use_nmake:
@@ -478,8 +1227,43 @@ class OpenSSLConan(ConanFile):
             # /Library/Developer/CommandLineTools/usr/bin/ar: internal ranlib command failed
             if self.settings.os == "Macos" and self._full_version < "1.1.0":
                 parallel = False
-            command.append(("-j%s" % tools.cpu_count()) if parallel else "-j1")
-        self.run(" ".join(command), win_bash=self._win_bash)
+            if parallel and self._make_jobserver:
+                jobs = "jobserver"  # job slots are handed out by the parent make
+            else:
+                jobs = self._make_jobs if parallel else 1
+                command.append("-j%s" % jobs)
+                max_load = tools.get_env("CONAN_OPENSSL_MAX_LOAD")
+                if parallel and max_load:
+                    command.append("-l%s" % max_load)
+        else:
+            jobs = 1
+        self._run(" ".join(command), phase=" ".join(["make"] + (targets or [])), jobs=jobs, win_bash=self._win_bash)
+
+    @property
+    def _make_jobserver(self):
+        # only the named pipe jobserver of GNU make 4.4 reaches the build: conan's runner closes the inherited
+        # descriptors of --jobserver-auth=R,W and --jobserver-fds=, and make would fall back to -j1
+        return "--jobserver-auth=fifo:" in os.environ.get("MAKEFLAGS", "")
+
+    @property
+    def _make_jobs(self):
+        jobs = tools.cpu_count()  # honours CONAN_CPU_COUNT
+        memory_per_job = tools.get_env("CONAN_OPENSSL_MEMORY_PER_JOB", 0)
+        available_memory = self._available_memory_mb
+        if memory_per_job and available_memory:
+            jobs = min(jobs, max(1, available_memory // memory_per_job))
+        return jobs
+
+    @property
+    def _available_memory_mb(self):
+        try:
+            with open("/proc/meminfo") as meminfo:
+                for line in meminfo:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) // 1024
+        except (IOError, OSError, ValueError):
+            pass
+        return None
 
     @property
     def _perl(self):
@@ -488,44 +1272,106 @@ class OpenSSLConan(ConanFile):
             return os.path.join(self.deps_cpp_info["strawberryperl"].rootpath, "perl", "bin", "perl.exe")
         return "perl"
 
-    def _make(self):
-        with tools.chdir(self._source_subfolder):
-            # workaround for MinGW (https://github.com/openssl/openssl/issues/7653)
-            if not os.path.isdir(os.path.join(self.package_folder, "bin")):
-                os.makedirs(os.path.join(self.package_folder, "bin"))
+    def _configure(self):
+        if not os.path.isdir(self._build_subfolder):
+            os.makedirs(self._build_subfolder)
+        with tools.chdir(self._build_subfolder):
             # workaround for clang-cl not producing .pdb files
             if self._is_clangcl:
                 tools.save("ossl_static.pdb", "")
             args = " ".join(self._configure_args)
             self.output.info(self._configure_args)
 
-            self.run('{perl} ./Configure {args}'.format(perl=self._perl, args=args), win_bash=self._win_bash)
+            if self._out_of_source:
+                configure = os.path.join(self.source_folder, self._source_subfolder, "Configure")
+                config_folder = os.path.join(self.build_folder, self._config_folder)
+                if self._win_bash:
+                    configure = tools.unix_path(configure)
+                    config_folder = tools.unix_path(config_folder)
+                env_vars = {"OPENSSL_LOCAL_CONFIG_DIR": config_folder.replace("\\", "/")}
+            else:
+                configure = "./Configure"
+                env_vars = {}
+            with tools.environment_append(env_vars):
+                self._run('{perl} {configure} {args}'.format(perl=self._perl, configure=configure, args=args),
+                          phase="configure", win_bash=self._win_bash)
 
             self._patch_install_name()
+            if self.options.reproducible:
+                self._patch_mkbuildinf()
+            if self._profiling_flags and not self._use_nmake and self._full_version < "1.1.0":
+                # the CFLAG of the 1.0.x targets comes after CC, it would take the frame pointers away again
+                tools.replace_in_file("Makefile", "-fomit-frame-pointer", "", strict=False)
 
             if self._use_nmake and self._full_version < "1.1.0":
                 if not self.options.no_asm and self.settings.arch == "x86":
-                    self.run(r"ms\do_nasm")
+                    self._run(r"ms\do_nasm", phase="do_nasm")
                 else:
-                    self.run(r"ms\do_ms" if self.settings.arch == "x86" else r"ms\do_win64a")
-                makefile = r"ms\ntdll.mak" if self.options.shared else r"ms\nt.mak"
+                    script = r"ms\do_ms" if self.settings.arch == "x86" else r"ms\do_win64a"
+                    self._run(script, phase=script[3:])
 
                 self._replace_runtime_in_file(os.path.join("ms", "nt.mak"))
                 self._replace_runtime_in_file(os.path.join("ms", "ntdll.mak"))
+                if self._compiler_launcher:
+                    for mak in ["nt.mak", "ntdll.mak"]:
+                        tools.replace_in_file(os.path.join("ms", mak), "CC=cl", "CC=%s cl" % self._compiler_launcher)
                 if self.settings.arch == "x86":
                     tools.replace_in_file(os.path.join("ms", "nt.mak"), "-WX", "")
                     tools.replace_in_file(os.path.join("ms", "ntdll.mak"), "-WX", "")
 
-                self._run_make(makefile=makefile)
-                self._run_make(makefile=makefile, targets=["install"], parallel=False)
+    def _make(self):
+        with tools.chdir(self._build_subfolder):
+            # workaround for MinGW (https://github.com/openssl/openssl/issues/7653)
+            if not os.path.isdir(os.path.join(self.package_folder, "bin")):
+                os.makedirs(os.path.join(self.package_folder, "bin"))
+            if self._use_nmake and self._full_version < "1.1.0":
+                makefile = r"ms\ntdll.mak" if self.options.shared else r"ms\nt.mak"
+                if self.options.libraries_only:
+                    # the install target depends on all, so the libraries are installed by hand
+                    self._run_make(makefile=makefile, targets=["init", "lib"], variables={"E_SHLIB": ""})
+                    self._install_nmake_libraries(makefile)
+                else:
+                    self._run_make(makefile=makefile)
+                    self._run_make(makefile=makefile, targets=["install"], parallel=False)
+            elif self._full_version < "1.1.0":
+                # the subdirectories outside of DIRS (apps, engines, test, tools) are skipped
+                variables = {"DIRS": "crypto ssl"} if self.options.libraries_only else {}
+                self._run_make(targets=["build_libs"] if self.options.libraries_only else None, variables=variables)
+                variables.update(self._install_variables)
+                self._run_make(targets=["install_sw"], parallel=False, variables=variables)
+            elif self.options.libraries_only:
+                self._run_make(targets=["build_libs"])
+                self._run_make(targets=["install_dev"], parallel=self._full_version >= "1.1.1",
+                               variables=self._install_variables)
             else:
                 self._run_make()
-                self._run_make(targets=["install_sw"], parallel=False)
+                # install_sw is safe to run in parallel since 1.1.1
+                self._run_make(targets=["install_sw"], parallel=self._full_version >= "1.1.1",
+                               variables=self._install_variables)
+            self._move_staged_install()
+
+    def _install_nmake_libraries(self, makefile):
+        macros = dict(re.findall(r"^(OUT_D|INCO_D)=(\S+)", tools.load(makefile), re.MULTILINE))
+        include_folder = os.path.join(self.package_folder, "include", "openssl")
+        if not os.path.isdir(include_folder):
+            os.makedirs(include_folder)
+        for filename in os.listdir(macros["INCO_D"]):
+            if filename.endswith(".h"):
+                shutil.copy(os.path.join(macros["INCO_D"], filename), include_folder)
+        extensions = [".lib", ".dll"] if self.options.shared else [".lib"]
+        for name in ["ssleay32", "libeay32"]:
+            for extension in extensions:
+                folder = os.path.join(self.package_folder, "bin" if extension == ".dll" else "lib")
+                if not os.path.isdir(folder):
+                    os.makedirs(folder)
+                shutil.copy(os.path.join(macros["OUT_D"], name + extension), folder)
 
     @property
     def _cc(self):
         if "CC" in os.environ:
             return os.environ["CC"]
+        if self._use_nmake:
+            return "clang-cl" if self._is_clangcl else "cl"
         if self.settings.compiler == "apple-clang":
             return tools.XCRun(self.settings).find("clang")
         elif self.settings.compiler == "clang":
@@ -534,22 +1380,132 @@ class OpenSSLConan(ConanFile):
             return "gcc"
         return "cc"
 
+    @staticmethod
+    def _children_peak_rss_kb():
+        if not resource:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        return peak // 1024 if sys.platform == "darwin" else peak  # bytes on macOS, KiB elsewhere
+
+    @contextmanager
+    def _profiled(self, phase, command=None, jobs=1):
+        peak_before = self._children_peak_rss_kb()
+        cpu_before = os.times()
+        wall_before = time.time()
+        yield
+        wall = time.time() - wall_before
+        cpu_after = os.times()
+        peak_after = self._children_peak_rss_kb()
+        self._build_profile.append({
+            "phase": phase,
+            "command": command,
+            "jobs": jobs,
+            "wall_time": round(wall, 3),
+            # user + system time of the children, zero on Windows where os.times() doesn't report it
+            "cpu_time": round(cpu_after[2] + cpu_after[3] - cpu_before[2] - cpu_before[3], 3),
+            # the rusage high-water mark covers every child of this process, so it is only
+            # attributable to this phase when the phase raised it
+            "peak_rss_kb": peak_after if peak_after is not None and peak_after > peak_before else None,
+        })
+
+    def _run(self, command, phase, jobs=1, **kwargs):
+        with self._profiled(phase, command=command, jobs=jobs):
+            self.run(command, **kwargs)
+
+    def _save_build_profile(self):
+        profile = {
+            "version": self.version,
+            "settings": {k: v for k, v in self.settings.values_list},
+            "options": {k: v for k, v in self.options.values.as_list()},
+            "cpu_count": tools.cpu_count(),
+            "phases": self._build_profile,
+            "wall_time": round(sum(phase["wall_time"] for phase in self._build_profile), 3),
+        }
+        tools.save(os.path.join(self.package_folder, "build-profile.json"), json.dumps(profile, indent=2))
+
+    @property
+    def _fingerprint_file(self):
+        return os.path.join(self._build_subfolder, "conan-configure.sha256")
+
+    @property
+    def _configured_fingerprint(self):
+        return tools.load(self._fingerprint_file) if os.path.isfile(self._fingerprint_file) else None
+
+    def _configure_fingerprint(self):
+        # everything that ends up in 20-conan.conf, Makefile.org or the Configure command line
+        env_vars = ["CC", "CXX", "AR", "RANLIB", "NM", "AS", "LD", "RC", "WINDRES", "CFLAGS", "CXXFLAGS",
+                    "CPPFLAGS", "LDFLAGS", "LIBS", "PERL", "CROSS_SDK", "CROSS_TOP", "CROSS_COMPILE",
+                    "CONAN_OPENSSL_CONFIGURATION"]
+        inputs = {
+            "version": self.version,
+            "configure_args": self._configure_args,
+            "env_build": self._get_env_build().vars,
+            "env": {name: os.environ.get(name) for name in env_vars},
+            "compiler_launcher": self._compiler_launcher,
+        }
+        if self._full_version >= "1.1.0":
+            inputs["target_config"] = self._target_config
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _configure_if_changed(self):
+        fingerprint = self._configure_fingerprint()
+        if self._configured_fingerprint == fingerprint:
+            self.output.info("configuration unchanged, skipping Configure")
+            return
+        if self._full_version >= "1.1.0":
+            with self._profiled("create_targets"):
+                self._create_targets()
+        else:
+            with self._profiled("patch_makefile_org"):
+                self._patch_makefile_org()
+        self._configure()
+        tools.save(self._fingerprint_file, fingerprint)
+
     def build(self):
+        self._build_profile = []
         with tools.vcvars(self.settings) if self._use_nmake else tools.no_op():
             env_vars = {"PERL": self._perl}
             if self._full_version < "1.1.0":
                 cflags = " ".join(self._get_env_build().flags)
-                env_vars["CC"] = "%s %s" % (self._cc, cflags)
+                cc = "%s %s" % (self._compiler_launcher, self._cc) if self._compiler_launcher else self._cc
+                env_vars["CC"] = "%s %s" % (cc, cflags)
             if self.settings.compiler == "apple-clang":
                 xcrun = tools.XCRun(self.settings)
                 env_vars["CROSS_SDK"] = os.path.basename(xcrun.sdk_path)
                 env_vars["CROSS_TOP"] = os.path.dirname(os.path.dirname(xcrun.sdk_path))
+            if self.options.get_safe("lto"):
+                env_vars.update(self._lto_tools)
+            if self.options.reproducible:
+                env_vars.update(self._reproducible_env)
             with tools.environment_append(env_vars):
-                if self._full_version >= "1.1.0":
-                    self._create_targets()
-                else:
-                    self._patch_makefile_org()
+                if self.options.get_safe("pgo"):
+                    self._pgo_stage = "generate"
+                    self._configure_if_changed()
+                    with tools.chdir(self._build_subfolder):
+                        self._run_make()
+                        self._pgo_train()
+                        self._run_make(targets=["clean"])
+                    self._pgo_stage = "use"
+                    self._env_build = None
+                self._configure_if_changed()
                 self._make()
+        self._print_launcher_stats()
+        self._save_build_profile()
+
+    @property
+    def _compiler_launcher(self):
+        return str(self.options.compiler_launcher) if self.options.compiler_launcher else None
+
+    def _print_launcher_stats(self):
+        launcher = self._compiler_launcher
+        if not launcher:
+            return
+        if os.path.splitext(os.path.basename(launcher))[0] not in ["ccache", "sccache"]:
+            return
+        try:
+            self.run("%s --show-stats" % launcher)
+        except ConanException as e:
+            self.output.warn("could not get compiler launcher statistics: %s" % e)
 
     @property
     def _win_bash(self):
@@ -581,7 +1537,8 @@ class OpenSSLConan(ConanFile):
         self.copy(src=self._source_subfolder, pattern="*LICENSE", dst="licenses")
         for root, _, files in os.walk(self.package_folder):
             for filename in files:
-                if fnmatch.fnmatch(filename, "*.pdb"):
+                # the profiling variant keeps its debug information
+                if fnmatch.fnmatch(filename, "*.pdb") and self.settings.build_type != "RelWithDebInfo":
                     os.unlink(os.path.join(self.package_folder, root, filename))
         if self._use_nmake:
             if self.settings.build_type == 'Debug' and self._full_version >= "1.1.0":
@@ -589,19 +1546,143 @@ class OpenSSLConan(ConanFile):
                     os.rename('libssl.lib', 'libssld.lib')
                     os.rename('libcrypto.lib', 'libcryptod.lib')
         tools.rmdir(os.path.join(self.package_folder, "lib", "pkgconfig"))
+        if self.options.no_cli:
+            for filename in ["openssl", "openssl.exe", "c_rehash"]:
+                if os.path.isfile(os.path.join(self.package_folder, "bin", filename)):
+                    os.unlink(os.path.join(self.package_folder, "bin", filename))
+            tools.rmdir(os.path.join(self.package_folder, "res", "misc"))
+        if self.options.strip:
+            self._strip()
+        if self.options.reproducible and not tools.is_apple_os(self.settings.os):
+            self._normalize_archives()
+        size = sum(os.path.getsize(os.path.join(root, filename))
+                   for root, _, files in os.walk(self.package_folder) for filename in files
+                   if not os.path.islink(os.path.join(root, filename)))
+        self.output.info("package size: %.1f MB" % (size / (1024.0 * 1024.0)))
+
+    @staticmethod
+    def _binary_format(filename):
+        with open(filename, "rb") as f:
+            magic = f.read(8)
+        if magic.startswith(b"!<arch>\n"):
+            return "archive"
+        if magic.startswith(b"\x7fELF") or magic.startswith(b"MZ"):
+            return "elf"  # GNU binutils handle PE the same way
+        if magic[:4] in [b"\xfe\xed\xfa\xce", b"\xce\xfa\xed\xfe", b"\xfe\xed\xfa\xcf", b"\xcf\xfa\xed\xfe"]:
+            return "macho"
+        return None
+
+    def _normalize_archives(self):
+        # the same as ar D: no timestamps, owners or modes in the members of the static libraries
+        for root, _, files in os.walk(os.path.join(self.package_folder, "lib")):
+            for filename in files:
+                path = os.path.join(root, filename)
+                if os.path.islink(path) or self._binary_format(path) != "archive":
+                    continue
+                with open(path, "r+b") as archive:
+                    archive.seek(0, os.SEEK_END)
+                    end = archive.tell()
+                    offset = 8  # !<arch>\n
+                    while offset + 60 <= end:
+                        # name[16] mtime[12] uid[6] gid[6] mode[8] size[10] `\n
+                        archive.seek(offset)
+                        header = archive.read(60)
+                        size = int(header[48:58])
+                        mode = b"0" if header.startswith((b"/ ", b"/SYM64/")) else b"644"  # symbol table
+                        archive.seek(offset + 16)
+                        archive.write(b"0".ljust(12) + b"0".ljust(6) + b"0".ljust(6) + mode.ljust(8))
+                        offset += 60 + size + size % 2
+
+    def _binutil(self, variable, name):
+        # the environment first, then the tool of the target triplet when cross building, e.g. aarch64-linux-gnu-strip
+        if variable in os.environ:
+            return os.environ[variable]
+        if tools.cross_building(self.settings):
+            try:
+                triplet = tools.get_gnu_triplet(str(self.settings.os), str(self.settings.arch),
+                                                str(self.settings.compiler))
+            except ConanException:
+                triplet = None
+            if triplet and tools.which("%s-%s" % (triplet, name)):
+                return "%s-%s" % (triplet, name)
+        return name
+
+    def _strip(self):
+        if self._use_nmake:
+            return  # MSVC keeps its debug information in the .pdb files, packaged for RelWithDebInfo only
+        # CONAN_OPENSSL_DEBUG_INFO_FOLDER: where the split debug information goes, per package id
+        debug_folder = tools.get_env("CONAN_OPENSSL_DEBUG_INFO_FOLDER")
+        if debug_folder:
+            debug_folder = os.path.join(debug_folder, os.path.basename(self.package_folder))
+        strip = self._binutil("STRIP", "strip")
+        objcopy = self._binutil("OBJCOPY", "objcopy")
+        if self.settings.compiler == "apple-clang" and "STRIP" not in os.environ:
+            strip = tools.XCRun(self.settings).strip
+        for folder in ["lib", "bin"]:
+            for root, _, files in os.walk(os.path.join(self.package_folder, folder)):
+                for filename in files:
+                    path = os.path.join(root, filename)
+                    binary_format = None if os.path.islink(path) else self._binary_format(path)
+                    if not binary_format:
+                        continue
+                    debug_path = os.path.join(debug_folder, os.path.relpath(path, self.package_folder)) \
+                        if debug_folder else None
+                    if debug_path and not os.path.isdir(os.path.dirname(debug_path)):
+                        os.makedirs(os.path.dirname(debug_path))
+                    if binary_format == "archive":
+                        if debug_path:
+                            shutil.copy2(path, debug_path)
+                        self.run('"%s" %s "%s"' % (strip, "-S" if tools.is_apple_os(self.settings.os) else "--strip-debug",
+                                                   path))
+                    elif binary_format == "macho":
+                        if debug_path:
+                            self.run('dsymutil "%s" -o "%s.dSYM"' % (path, debug_path))
+                        self.run('"%s" -x "%s"' % (strip, path))
+                    else:
+                        if debug_path:
+                            self.run('"%s" --only-keep-debug "%s" "%s.debug"' % (objcopy, path, debug_path))
+                        self.run('"%s" --strip-unneeded "%s"' % (strip, path))
+                        if debug_path:
+                            self.run('"%s" --add-gnu-debuglink="%s.debug" "%s"' % (objcopy, debug_path, path))
+        if debug_folder:
+            self.output.info("debug information: %s" % debug_folder)
 
     def package_info(self):
+        self.cpp_info.names["cmake_find_package"] = "OpenSSL"
+        self.cpp_info.names["cmake_find_package_multi"] = "OpenSSL"
+        crypto = self.cpp_info.components["crypto"]
+        ssl = self.cpp_info.components["ssl"]
+        # same targets as CMake's FindOpenSSL: OpenSSL::Crypto and OpenSSL::SSL
+        for component, name in [(crypto, "Crypto"), (ssl, "SSL")]:
+            component.names["cmake_find_package"] = name
+            component.names["cmake_find_package_multi"] = name
         if self._use_nmake:
             if self._full_version < "1.1.0":
-                self.cpp_info.libs = ["ssleay32", "libeay32"]
+                ssl.libs, crypto.libs = ["ssleay32"], ["libeay32"]
             else:
                 if self.settings.build_type == "Debug":
-                    self.cpp_info.libs = ['libssld', 'libcryptod']
+                    ssl.libs, crypto.libs = ["libssld"], ["libcryptod"]
                 else:
-                    self.cpp_info.libs = ['libssl', 'libcrypto']
+                    ssl.libs, crypto.libs = ["libssl"], ["libcrypto"]
         else:
-            self.cpp_info.libs = ["ssl", "crypto"]
+            ssl.libs, crypto.libs = ["ssl"], ["crypto"]
+        ssl.requires = ["crypto"]
+        if not self.options.no_zlib:
+            crypto.requires.append("zlib::zlib")
         if self.settings.os == "Windows":
-            self.cpp_info.libs.extend(["crypt32", "msi", "ws2_32", "advapi32", "user32", "gdi32"])
+            crypto.system_libs = ["crypt32", "msi", "ws2_32", "advapi32", "user32", "gdi32"]
         elif self.settings.os == "Linux":
-            self.cpp_info.libs.extend(["dl", "pthread"])
+            if not self.options.no_dso or self._full_version < "1.1.0":
+                crypto.system_libs.append("dl")
+            if not self.options.no_threads:
+                crypto.system_libs.append("pthread")
+        if self.options.reproducible:
+            # the compiled in locations are fixed, the ones of this package are given at runtime
+            res = os.path.join(self.package_folder, "res")
+            if not self.options.openssldir and os.path.isfile(os.path.join(res, "openssl.cnf")):
+                self.env_info.OPENSSL_CONF = os.path.join(res, "openssl.cnf")
+            if not self.options.openssldir and os.path.isdir(os.path.join(res, "certs")):
+                self.env_info.SSL_CERT_DIR = os.path.join(res, "certs")
+            engines = glob.glob(os.path.join(self.package_folder, "lib", "engines*"))
+            if engines:
+                self.env_info.OPENSSL_ENGINES = engines[0]
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+# binary compatibility rules shared by the recipe (package_id) and build.py (matrix collapsing),
+# exported with the recipe
+
+from conans.model.version import Version
+
+# oldest version of the compiler from which on C binaries link with the ones of any newer version
+ABI_STABLE_COMPILER_VERSIONS = {"gcc": "5", "clang": "3.9", "apple-clang": "7.0", "Visual Studio": "14"}
+
+
+def compatible_compiler_versions(compiler, version, known_versions):
+    # older versions of the compiler whose binaries a consumer built with this version can use, newest first
+    oldest = ABI_STABLE_COMPILER_VERSIONS.get(str(compiler))
+    if not oldest or Version(str(version)) < oldest:
+        return []
+    compatible = [Version(str(known)) for known in known_versions
+                  if oldest <= Version(str(known)) < Version(str(version))]
+    return [str(known) for known in sorted(compatible, reverse=True)]
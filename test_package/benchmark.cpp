@@ -0,0 +1,302 @@
+#include <stdlib.h>
+#include <stdio.h>
+#include <string.h>
+#include <chrono>
+#include <functional>
+#include <memory>
+#include <string>
+#include <thread>
+#include <vector>
+#include <openssl/opensslconf.h>
+#include <openssl/crypto.h>
+#include <openssl/evp.h>
+#include <openssl/obj_mac.h>
+#include <openssl/opensslv.h>
+// the workloads of algorithms the package was built without (no_rsa, features=no-ec...) are left out
+#ifndef OPENSSL_NO_RSA
+#include <openssl/rsa.h>
+#endif
+#ifndef OPENSSL_NO_EC
+#include <openssl/ec.h>
+#include <openssl/ecdh.h>
+#include <openssl/ecdsa.h>
+#endif
+
+#if OPENSSL_VERSION_NUMBER >= 0x10100000L
+#define OPENSSL_1_1_0_OR_LATER
+#endif
+#if OPENSSL_VERSION_NUMBER >= 0x10101000L
+#define OPENSSL_1_1_1_OR_LATER
+#endif
+#ifndef OPENSSL_1_1_0_OR_LATER
+#define EVP_MD_CTX_new EVP_MD_CTX_create
+#define EVP_MD_CTX_free EVP_MD_CTX_destroy
+#endif
+// 1.0.x needs locking callbacks to be used from several threads
+#if defined(OPENSSL_1_1_0_OR_LATER) && defined(OPENSSL_THREADS)
+#define BENCHMARK_THREADS
+#endif
+
+typedef std::function<void()> Operation;
+// creates the per thread state of a workload and returns one operation on it
+typedef std::function<Operation()> Workload;
+
+struct Result {
+	std::string name;
+	size_t size;
+	unsigned int threads;
+	double value;
+	const char *unit;
+};
+
+static double seconds_since(std::chrono::steady_clock::time_point start)
+{
+	return std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+}
+
+static double operations_per_second(const Workload &workload, unsigned int threads, double duration)
+{
+	std::vector<double> rates(threads, 0.0);
+	auto worker = [&](unsigned int index) {
+		Operation operation = workload();
+		auto start = std::chrono::steady_clock::now();
+		unsigned long long count = 0;
+		double elapsed;
+		do {
+			for (int i = 0; i < 8; i++)
+				operation();
+			count += 8;
+			elapsed = seconds_since(start);
+		} while (elapsed < duration);
+		rates[index] = count / elapsed;
+	};
+	if (threads == 1) {
+		worker(0);
+	} else {
+		std::vector<std::thread> pool;
+		for (unsigned int i = 0; i < threads; i++)
+			pool.push_back(std::thread(worker, i));
+		for (auto &thread : pool)
+			thread.join();
+	}
+	double total = 0.0;
+	for (double rate : rates)
+		total += rate;
+	return total;
+}
+
+static Workload digest(const EVP_MD *md, size_t size)
+{
+	return [md, size]() -> Operation {
+		std::shared_ptr<EVP_MD_CTX> ctx(EVP_MD_CTX_new(), EVP_MD_CTX_free);
+		std::shared_ptr<std::vector<unsigned char> > input(new std::vector<unsigned char>(size, 'x'));
+		return [ctx, input, md]() {
+			unsigned char output[EVP_MAX_MD_SIZE];
+			unsigned int output_len;
+			EVP_DigestInit_ex(ctx.get(), md, NULL);
+			EVP_DigestUpdate(ctx.get(), input->data(), input->size());
+			EVP_DigestFinal_ex(ctx.get(), output, &output_len);
+		};
+	};
+}
+
+static Workload aead(const EVP_CIPHER *cipher, size_t size)
+{
+	return [cipher, size]() -> Operation {
+		static const unsigned char key[32] = {0};
+		static const unsigned char iv[12] = {0};
+		std::shared_ptr<EVP_CIPHER_CTX> ctx(EVP_CIPHER_CTX_new(), EVP_CIPHER_CTX_free);
+		EVP_EncryptInit_ex(ctx.get(), cipher, NULL, key, iv);
+		std::shared_ptr<std::vector<unsigned char> > input(new std::vector<unsigned char>(size, 'x'));
+		std::shared_ptr<std::vector<unsigned char> > output(new std::vector<unsigned char>(size + 16));
+		return [ctx, input, output]() {
+			unsigned char tag[16];
+			int len;
+			EVP_EncryptInit_ex(ctx.get(), NULL, NULL, NULL, iv);
+			EVP_EncryptUpdate(ctx.get(), output->data(), &len, input->data(), (int)input->size());
+			EVP_EncryptFinal_ex(ctx.get(), output->data() + len, &len);
+			EVP_CIPHER_CTX_ctrl(ctx.get(), EVP_CTRL_GCM_GET_TAG, sizeof(tag), tag);
+		};
+	};
+}
+
+#ifndef OPENSSL_NO_RSA
+static Workload rsa_sign(EVP_PKEY *pkey)
+{
+	return [pkey]() -> Operation {
+		std::shared_ptr<EVP_PKEY_CTX> ctx(EVP_PKEY_CTX_new(pkey, NULL), EVP_PKEY_CTX_free);
+		EVP_PKEY_sign_init(ctx.get());
+		EVP_PKEY_CTX_set_rsa_padding(ctx.get(), RSA_PKCS1_PADDING);
+		EVP_PKEY_CTX_set_signature_md(ctx.get(), EVP_sha256());
+		return [ctx]() {
+			static const unsigned char digest[32] = {0};
+			unsigned char signature[512];
+			size_t signature_len = sizeof(signature);
+			EVP_PKEY_sign(ctx.get(), signature, &signature_len, digest, sizeof(digest));
+		};
+	};
+}
+
+#endif
+
+#ifndef OPENSSL_NO_EC
+static Workload ecdsa_sign(EC_KEY *key)
+{
+	return [key]() -> Operation {
+		return [key]() {
+			static const unsigned char digest[32] = {0};
+			unsigned char signature[128];
+			unsigned int signature_len;
+			ECDSA_sign(0, digest, sizeof(digest), signature, &signature_len, key);
+		};
+	};
+}
+
+static Workload ecdh(EC_KEY *key, EC_KEY *peer)
+{
+	return [key, peer]() -> Operation {
+		return [key, peer]() {
+			unsigned char secret[66];
+			ECDH_compute_key(secret, sizeof(secret), EC_KEY_get0_public_key(peer), key, NULL);
+		};
+	};
+}
+
+static EC_KEY *p256_key()
+{
+	EC_KEY *key = EC_KEY_new_by_curve_name(NID_X9_62_prime256v1);
+	EC_KEY_generate_key(key);
+	return key;
+}
+#endif
+
+#if defined(OPENSSL_1_1_0_OR_LATER) && !defined(OPENSSL_NO_EC)
+static EVP_PKEY *x25519_key()
+{
+	EVP_PKEY *pkey = NULL;
+	EVP_PKEY_CTX *ctx = EVP_PKEY_CTX_new_id(EVP_PKEY_X25519, NULL);
+	EVP_PKEY_keygen_init(ctx);
+	EVP_PKEY_keygen(ctx, &pkey);
+	EVP_PKEY_CTX_free(ctx);
+	return pkey;
+}
+
+static Workload x25519(EVP_PKEY *key, EVP_PKEY *peer)
+{
+	return [key, peer]() -> Operation {
+		std::shared_ptr<EVP_PKEY_CTX> ctx(EVP_PKEY_CTX_new(key, NULL), EVP_PKEY_CTX_free);
+		EVP_PKEY_derive_init(ctx.get());
+		EVP_PKEY_derive_set_peer(ctx.get(), peer);
+		return [ctx]() {
+			unsigned char secret[32];
+			size_t secret_len = sizeof(secret);
+			EVP_PKEY_derive(ctx.get(), secret, &secret_len);
+		};
+	};
+}
+#endif
+
+int main(int argc, char **argv)
+{
+	if (argc < 2) {
+		fprintf(stderr, "usage: %s <results.json> [seconds per measurement]\n", argv[0]);
+		return 1;
+	}
+	const double duration = argc > 2 ? atof(argv[2]) : 0.5;
+
+	std::vector<unsigned int> thread_counts(1, 1);
+#ifdef BENCHMARK_THREADS
+	unsigned int max_threads = std::thread::hardware_concurrency();
+	if (max_threads > 1)
+		thread_counts.push_back(max_threads);
+#endif
+
+	OpenSSL_add_all_algorithms();
+
+	struct Throughput { std::string name; const EVP_MD *md; const EVP_CIPHER *cipher; };
+	std::vector<Throughput> throughputs;
+#ifndef OPENSSL_NO_SHA256
+	throughputs.push_back(Throughput{"sha256", EVP_sha256(), NULL});
+#endif
+#ifndef OPENSSL_NO_SHA512
+	throughputs.push_back(Throughput{"sha512", EVP_sha512(), NULL});
+#endif
+#ifdef OPENSSL_1_1_1_OR_LATER
+	throughputs.push_back(Throughput{"sha3-256", EVP_sha3_256(), NULL});
+#endif
+#ifndef OPENSSL_NO_AES
+	throughputs.push_back(Throughput{"aes-128-gcm", NULL, EVP_aes_128_gcm()});
+	throughputs.push_back(Throughput{"aes-256-gcm", NULL, EVP_aes_256_gcm()});
+#endif
+#if defined(OPENSSL_1_1_0_OR_LATER) && !defined(OPENSSL_NO_CHACHA) && !defined(OPENSSL_NO_POLY1305)
+	throughputs.push_back(Throughput{"chacha20-poly1305", NULL, EVP_chacha20_poly1305()});
+#endif
+	const size_t sizes[] = {16, 256, 1024, 8192, 16384};
+
+	struct KeyOperation { std::string name; Workload workload; };
+	std::vector<KeyOperation> operations;
+#ifndef OPENSSL_NO_RSA
+	EVP_PKEY *rsa = NULL;
+	EVP_PKEY_CTX *rsa_ctx = EVP_PKEY_CTX_new_id(EVP_PKEY_RSA, NULL);
+	EVP_PKEY_keygen_init(rsa_ctx);
+	EVP_PKEY_CTX_set_rsa_keygen_bits(rsa_ctx, 2048);
+	EVP_PKEY_keygen(rsa_ctx, &rsa);
+	EVP_PKEY_CTX_free(rsa_ctx);
+	operations.push_back(KeyOperation{"rsa2048-sign", rsa_sign(rsa)});
+#endif
+#ifndef OPENSSL_NO_EC
+	EC_KEY *p256 = p256_key(), *p256_peer = p256_key();
+	operations.push_back(KeyOperation{"ecdsa-p256-sign", ecdsa_sign(p256)});
+	operations.push_back(KeyOperation{"ecdh-p256", ecdh(p256, p256_peer)});
+#endif
+#if defined(OPENSSL_1_1_0_OR_LATER) && !defined(OPENSSL_NO_EC)
+	EVP_PKEY *x25519_a = x25519_key(), *x25519_b = x25519_key();
+	operations.push_back(KeyOperation{"x25519", x25519(x25519_a, x25519_b)});
+#endif
+
+	std::vector<Result> results;
+	for (unsigned int threads : thread_counts) {
+		for (const Throughput &throughput : throughputs) {
+			for (size_t size : sizes) {
+				Workload workload = throughput.md ? digest(throughput.md, size) : aead(throughput.cipher, size);
+				double value = operations_per_second(workload, threads, duration) * size;
+				results.push_back(Result{throughput.name, size, threads, value, "bytes/s"});
+				printf("%-20s %6u bytes %3u threads %14.0f bytes/s\n", throughput.name.c_str(), (unsigned int)size,
+				       threads, value);
+			}
+		}
+		for (const KeyOperation &operation : operations) {
+			double value = operations_per_second(operation.workload, threads, duration);
+			results.push_back(Result{operation.name, 0, threads, value, "ops/s"});
+			printf("%-20s %12s %3u threads %14.0f ops/s\n", operation.name.c_str(), "", threads, value);
+		}
+	}
+
+	FILE *json = fopen(argv[1], "w");
+	if (!json) {
+		perror(argv[1]);
+		return 1;
+	}
+	fprintf(json, "{\n  \"openssl\": \"%s\",\n  \"results\": [\n", SSLeay_version(SSLEAY_VERSION));
+	for (size_t i = 0; i < results.size(); i++) {
+		const Result &result = results[i];
+		fprintf(json, "    {\"name\": \"%s\", \"size\": %u, \"threads\": %u, \"value\": %.1f, \"unit\": \"%s\"}%s\n",
+		        result.name.c_str(), (unsigned int)result.size, result.threads, result.value, result.unit,
+		        i + 1 < results.size() ? "," : "");
+	}
+	fprintf(json, "  ]\n}\n");
+	fclose(json);
+
+#ifndef OPENSSL_NO_RSA
+	EVP_PKEY_free(rsa);
+#endif
+#ifndef OPENSSL_NO_EC
+	EC_KEY_free(p256);
+	EC_KEY_free(p256_peer);
+#endif
+#if defined(OPENSSL_1_1_0_OR_LATER) && !defined(OPENSSL_NO_EC)
+	EVP_PKEY_free(x25519_a);
+	EVP_PKEY_free(x25519_b);
+#endif
+	return 0;
+}
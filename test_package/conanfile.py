@@ -1,6 +1,23 @@
 # -*- coding: utf-8 -*-
 from conans import CMake, tools, ConanFile
 import os
+import json
+from conans.errors import ConanException
+
+# /proc/cpuinfo flags the code built for each OpenSSL:march value relies on
+MARCH_CPU_FLAGS = {
+    "x86-64-v2": ["cx16", "lahf_lm", "popcnt", "sse4_1", "sse4_2", "ssse3"],
+    "x86-64-v3": ["cx16", "lahf_lm", "popcnt", "sse4_1", "sse4_2", "ssse3",
+                  "avx", "avx2", "bmi1", "bmi2", "f16c", "fma", "abm", "movbe", "xsave"],
+    "x86-64-v4": ["cx16", "lahf_lm", "popcnt", "sse4_1", "sse4_2", "ssse3",
+                  "avx", "avx2", "bmi1", "bmi2", "f16c", "fma", "abm", "movbe", "xsave",
+                  "avx512f", "avx512bw", "avx512cd", "avx512dq", "avx512vl"],
+    "armv8-a": ["fp", "asimd"],
+    # only the features the architecture makes mandatory, fp16 and the rest of the optional ones aren't enabled
+    # by -march=armv8.2-a and may be missing on a CPU the build runs on
+    "armv8.2-a": ["fp", "asimd", "atomics", "asimdrdm"],
+    "armv8.4-a": ["fp", "asimd", "atomics", "asimdrdm", "asimddp", "uscat", "ilrcpc", "flagm", "dit"],
+}
 
 
 class DefaultNameConan(ConanFile):
@@ -13,6 +30,13 @@ class DefaultNameConan(ConanFile):
         if self.settings.os == "Android":
             cmake.definitions["CONAN_LIBCXX"] = ""
         cmake.definitions["USE_FIND_PACKAGE"] = use_find_package
+        cmake.definitions["OPENSSL_TEST_TARGETS"] = ";".join(self._test_targets)
+        # what a consumer of OpenSSL::crypto alone links, libssl isn't in there
+        crypto = self.deps_cpp_info["OpenSSL"].components["crypto"]
+        crypto_libs = list(crypto.libs)
+        if "zlib" in self.deps_cpp_info.deps:
+            crypto_libs.extend(self.deps_cpp_info["zlib"].libs)
+        cmake.definitions["OPENSSL_CRYPTO_COMPONENT_LIBS"] = ";".join(crypto_libs + list(crypto.system_libs))
         cmake.definitions["OPENSSL_ROOT_DIR"] = self.deps_cpp_info["OpenSSL"].rootpath
         cmake.definitions["OPENSSL_USE_STATIC_LIBS"] = not self.options["OpenSSL"].shared
         if self.settings.compiler == 'Visual Studio':
@@ -21,12 +45,161 @@ class DefaultNameConan(ConanFile):
         cmake.configure()
         cmake.build()
 
+    @property
+    def _test_targets(self):
+        # the benchmarks and checks are only compiled when test() runs them
+        if tools.cross_building(self.settings):
+            return []
+        openssl = self.options["OpenSSL"]
+        targets = []
+        if tools.get_env("CONAN_OPENSSL_BENCHMARK"):
+            targets.append("benchmark")
+        if tools.get_env("CONAN_OPENSSL_TLS_BENCHMARK"):
+            targets.append("tls_benchmark")
+        if openssl.get_safe("performance_features"):
+            targets.append("ec_fast_path")
+        if self.settings.build_type == "RelWithDebInfo":
+            targets.append("unwind_check")
+        if tools.get_env("CONAN_OPENSSL_LOAD_BENCHMARK") and openssl.shared and self.settings.os == "Linux":
+            targets.append("load_benchmark")
+        return targets
+
     def build(self):
         self._build_cmake(use_find_package=True)
         self._build_cmake(use_find_package=False)
 
+    def _check_march(self):
+        march = self.options["OpenSSL"].get_safe("march")
+        if not march or str(march) not in MARCH_CPU_FLAGS:
+            return
+        if not os.path.isfile("/proc/cpuinfo"):
+            self.output.warn("can't check the CPU features required by march=%s on this platform" % march)
+            return
+        cpu_flags = set()
+        for line in tools.load("/proc/cpuinfo").splitlines():
+            if line.startswith("flags") or line.startswith("Features"):
+                cpu_flags.update(line.split(":", 1)[1].split())
+        missing = [flag for flag in MARCH_CPU_FLAGS[str(march)] if flag not in cpu_flags]
+        if missing:
+            raise ConanException("OpenSSL was built with march=%s but this CPU lacks: %s" %
+                                 (march, " ".join(missing)))
+
+    def _benchmark(self):
+        # CONAN_OPENSSL_BENCHMARK: seconds per measurement, the benchmark doesn't run when unset
+        duration = tools.get_env("CONAN_OPENSSL_BENCHMARK")
+        if not duration:
+            return
+        results_path = os.path.abspath("benchmark.json")
+        self.run("%s %s %s" % (os.path.join("bin", "benchmark"), results_path, duration), run_environment=True)
+        self.output.info("benchmark results: %s" % results_path)
+        results = json.loads(tools.load(results_path))
+
+        baseline_path = tools.get_env("CONAN_OPENSSL_BENCHMARK_BASELINE")
+        if not baseline_path:
+            return
+        if not os.path.isfile(baseline_path):
+            self.output.info("saving benchmark baseline: %s" % baseline_path)
+            tools.save(baseline_path, json.dumps(results, indent=2))
+            return
+        baseline = {(r["name"], r["size"], r["threads"]): r["value"]
+                    for r in json.loads(tools.load(baseline_path))["results"]}
+        tolerance = float(tools.get_env("CONAN_OPENSSL_BENCHMARK_TOLERANCE", "0.1"))
+        regressions = []
+        for result in results["results"]:
+            key = (result["name"], result["size"], result["threads"])
+            if not baseline.get(key):
+                continue
+            ratio = result["value"] / baseline[key]
+            line = "%s %s bytes %s threads: %.2fx baseline" % (key + (ratio,))
+            self.output.info(line)
+            if ratio < 1 - tolerance:
+                regressions.append(line)
+        if regressions:
+            raise ConanException("benchmark regressions against %s:\n%s" % (baseline_path, "\n".join(regressions)))
+
+    def _tls_benchmark(self):
+        # CONAN_OPENSSL_TLS_BENCHMARK: seconds per measurement, the benchmark doesn't run when unset
+        duration = tools.get_env("CONAN_OPENSSL_TLS_BENCHMARK")
+        if not duration:
+            return
+        threads = tools.get_env("CONAN_OPENSSL_TLS_BENCHMARK_THREADS", "1")
+        results_path = os.path.abspath("tls_benchmark.json")
+        self.run("%s %s %s %s" % (os.path.join("bin", "tls_benchmark"), results_path, duration, threads),
+                 run_environment=True)
+        # the options are recorded, so results of different builds (no_threads, no_async, shared...) can be compared
+        results = json.loads(tools.load(results_path))
+        results["options"] = {name: str(value) for name, value in self.options["OpenSSL"].items()}
+        tools.save(results_path, json.dumps(results, indent=2))
+        self.output.info("TLS benchmark results: %s" % results_path)
+
+    def _load_benchmark(self):
+        # CONAN_OPENSSL_LOAD_BENCHMARK: number of measurements, the benchmark doesn't run when unset
+        iterations = tools.get_env("CONAN_OPENSSL_LOAD_BENCHMARK")
+        if not iterations or not self.options["OpenSSL"].shared or self.settings.os != "Linux":
+            return
+        libssl = os.path.join(self.deps_cpp_info["OpenSSL"].lib_paths[0], "libssl.so")
+        results_path = os.path.abspath("load_benchmark.json")
+        self.run("%s %s %s %s" % (os.path.join("bin", "load_benchmark"), libssl, results_path, iterations),
+                 run_environment=True)
+        results = json.loads(tools.load(results_path))
+        results["options"] = {name: str(value) for name, value in self.options["OpenSSL"].items()}
+        tools.save(results_path, json.dumps(results, indent=2))
+        self.output.info("load benchmark results: %s" % results_path)
+
+        # the baseline is typically a build without fast_load, the comparison is informative only
+        baseline_path = tools.get_env("CONAN_OPENSSL_LOAD_BENCHMARK_BASELINE")
+        if not baseline_path:
+            return
+        if not os.path.isfile(baseline_path):
+            self.output.info("saving load benchmark baseline: %s" % baseline_path)
+            tools.save(baseline_path, json.dumps(results, indent=2))
+            return
+        baseline = json.loads(tools.load(baseline_path))
+        self.output.info("dlopen + init p50: %.1f us, baseline %.1f us" % (results["p50_us"], baseline["p50_us"]))
+        baseline_libraries = {library["name"]: library for library in baseline["libraries"]}
+        for library in results["libraries"]:
+            before = baseline_libraries.get(library["name"])
+            if before:
+                self.output.info("%s: %d relocations, %d PLT, baseline %d relocations, %d PLT" %
+                                 (library["name"], library["relocations"], library["plt"],
+                                  before["relocations"], before["plt"]))
+
+    def _check_performance_features(self):
+        if not self.options["OpenSSL"].get_safe("performance_features"):
+            return
+        # exits with 1 when the curves don't use the nistp methods, 2 when enable-ec_nistp_64_gcc_128 isn't
+        # supported by the target and 3 when the nistp methods measured slower, which only fails the test
+        # with CONAN_OPENSSL_EC_FAST_PATH_STRICT as the timings of shared CI machines are noisy
+        status = self.run(os.path.join("bin", "ec_fast_path"), run_environment=True, ignore_errors=True)
+        if status == 2:
+            self.output.warn("ec_nistp_64_gcc_128 isn't available for this configuration")
+        elif status == 3 and not tools.get_env("CONAN_OPENSSL_EC_FAST_PATH_STRICT", False):
+            self.output.warn("the ec_nistp_64_gcc_128 code paths measured slower than the generic ones")
+        elif status == 3:
+            raise ConanException("the ec_nistp_64_gcc_128 code paths are not faster")
+        elif status != 0:
+            raise ConanException("the ec_nistp_64_gcc_128 code paths are not active")
+
+    def _check_unwind(self):
+        if self.settings.build_type != "RelWithDebInfo":
+            return
+        # RelWithDebInfo is the profiling variant: a sampling profiler walking the frame pointers must get
+        # from libcrypto back to the caller. exits with 2 when the check isn't supported on this platform
+        status = self.run(os.path.join("bin", "unwind_check"), run_environment=True, ignore_errors=True)
+        if status == 2:
+            self.output.warn("frame pointer unwinding isn't checked for this configuration")
+        elif status != 0:
+            raise ConanException("sampled stacks don't unwind through the EVP_ functions of libcrypto")
+
     def test(self):
         if not tools.cross_building(self.settings):
+            self._check_march()
             bin_path = os.path.join("bin", "digest")
             self.run(bin_path, run_environment=True)
+            self.run(os.path.join("bin", "crypto_only"), run_environment=True)
+            self._check_performance_features()
+            self._check_unwind()
+            self._benchmark()
+            self._tls_benchmark()
+            self._load_benchmark()
         assert os.path.exists(os.path.join(self.deps_cpp_info["OpenSSL"].rootpath, "licenses", "LICENSE"))
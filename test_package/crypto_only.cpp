@@ -0,0 +1,23 @@
+#include <stdio.h>
+#include <string.h>
+#include <openssl/crypto.h>
+#include <openssl/evp.h>
+
+// links libcrypto only, through the crypto component of the package
+int main()
+{
+	const char message[] = "happy";
+	const char expected[] = "489f719cadf919094ddb38e7654de153ac33c02febb5de91e5345cbe372cf4a0";
+	char digest_string[EVP_MAX_MD_SIZE * 2 + 1] = {0};
+	unsigned char digest[EVP_MAX_MD_SIZE];
+	unsigned int digest_len;
+	if (!EVP_Digest(message, strlen(message), digest, &digest_len, EVP_sha256(), NULL)) {
+		printf("EVP_Digest failed\n");
+		return 1;
+	}
+	for (unsigned int i = 0; i < digest_len; i++)
+		sprintf(&digest_string[i * 2], "%02x", (unsigned int)digest[i]);
+	printf("sha256 digest: %s\n", digest_string);
+	printf("crypto library version: %s\n", SSLeay_version(SSLEAY_VERSION));
+	return strcmp(digest_string, expected) == 0 ? 0 : 1;
+}
@@ -0,0 +1,133 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include <chrono>
+#include <openssl/opensslconf.h>
+
+// exit status: 0 the curves use the nistp code paths, 1 they don't, 2 OpenSSL was built without EC or
+// enable-ec_nistp_64_gcc_128, 3 the nistp code paths are used but measured slower than the generic ones
+#if defined(OPENSSL_NO_EC) || defined(OPENSSL_NO_EC_NISTP_64_GCC_128)
+int main()
+{
+	printf("ec_nistp_64_gcc_128 is not enabled\n");
+	return 2;
+}
+#else
+#include <openssl/bn.h>
+#include <openssl/ec.h>
+#include <openssl/ecdh.h>
+#include <openssl/ecdsa.h>
+#include <openssl/obj_mac.h>
+
+typedef const EC_METHOD *(*MethodFunction)(void);
+
+struct Curve {
+	const char *name;
+	int nid;
+	MethodFunction method;
+};
+
+// the same curve on top of the generic Montgomery arithmetic
+static EC_GROUP *generic_group(const EC_GROUP *group)
+{
+	BN_CTX *ctx = BN_CTX_new();
+	BIGNUM *p = BN_new(), *a = BN_new(), *b = BN_new(), *x = BN_new(), *y = BN_new();
+	BIGNUM *order = BN_new(), *cofactor = BN_new();
+	EC_GROUP_get_curve_GFp(group, p, a, b, ctx);
+	EC_POINT_get_affine_coordinates_GFp(group, EC_GROUP_get0_generator(group), x, y, ctx);
+	EC_GROUP_get_order(group, order, ctx);
+	EC_GROUP_get_cofactor(group, cofactor, ctx);
+
+	EC_GROUP *generic = EC_GROUP_new(EC_GFp_mont_method());
+	EC_GROUP_set_curve_GFp(generic, p, a, b, ctx);
+	EC_POINT *generator = EC_POINT_new(generic);
+	EC_POINT_set_affine_coordinates_GFp(generic, generator, x, y, ctx);
+	EC_GROUP_set_generator(generic, generator, order, cofactor);
+
+	EC_POINT_free(generator);
+	BN_free(p);
+	BN_free(a);
+	BN_free(b);
+	BN_free(x);
+	BN_free(y);
+	BN_free(order);
+	BN_free(cofactor);
+	BN_CTX_free(ctx);
+	return generic;
+}
+
+static EC_KEY *generate_key(const EC_GROUP *group)
+{
+	EC_KEY *key = EC_KEY_new();
+	EC_KEY_set_group(key, group);
+	EC_KEY_generate_key(key);
+	return key;
+}
+
+template <typename Operation> static double operations_per_second(Operation operation, double duration)
+{
+	auto start = std::chrono::steady_clock::now();
+	unsigned long long count = 0;
+	double elapsed;
+	do {
+		for (int i = 0; i < 8; i++)
+			operation();
+		count += 8;
+		elapsed = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+	} while (elapsed < duration);
+	return count / elapsed;
+}
+
+// returns ECDH and ECDSA sign ops/s on the given group
+static void measure(const EC_GROUP *group, double duration, double *ecdh, double *ecdsa)
+{
+	EC_KEY *key = generate_key(group), *peer = generate_key(group);
+	*ecdh = operations_per_second([&]() {
+		unsigned char secret[66];
+		ECDH_compute_key(secret, sizeof(secret), EC_KEY_get0_public_key(peer), key, NULL);
+	}, duration);
+	*ecdsa = operations_per_second([&]() {
+		static const unsigned char digest[32] = {0};
+		unsigned char signature[160];
+		unsigned int signature_len;
+		ECDSA_sign(0, digest, sizeof(digest), signature, &signature_len, key);
+	}, duration);
+	EC_KEY_free(key);
+	EC_KEY_free(peer);
+}
+
+int main(int argc, char **argv)
+{
+	const double duration = argc > 1 ? atof(argv[1]) : 0.2;
+	// P-256 isn't checked, x86_64 and aarch64 use the even faster nistz256 assembly for it
+	const Curve curves[] = {
+		{"P-224", NID_secp224r1, EC_GFp_nistp224_method},
+		{"P-521", NID_secp521r1, EC_GFp_nistp521_method},
+	};
+	int status = 0;
+	for (const Curve &curve : curves) {
+		EC_GROUP *group = EC_GROUP_new_by_curve_name(curve.nid);
+		if (EC_GROUP_method_of(group) != curve.method()) {
+			printf("%s doesn't use the nistp implementation\n", curve.name);
+			status = 1;
+			EC_GROUP_free(group);
+			continue;
+		}
+		EC_GROUP *generic = generic_group(group);
+		double fast_ecdh, fast_ecdsa, generic_ecdh, generic_ecdsa;
+		measure(group, duration, &fast_ecdh, &fast_ecdsa);
+		measure(generic, duration, &generic_ecdh, &generic_ecdsa);
+		printf("%s ecdh:  %10.0f ops/s, generic %10.0f ops/s (%.2fx)\n", curve.name, fast_ecdh, generic_ecdh,
+		       fast_ecdh / generic_ecdh);
+		printf("%s ecdsa: %10.0f ops/s, generic %10.0f ops/s (%.2fx)\n", curve.name, fast_ecdsa, generic_ecdsa,
+		       fast_ecdsa / generic_ecdsa);
+		// timings of a shared machine are noisy, they only decide the status when the method matched
+		if ((fast_ecdh < generic_ecdh || fast_ecdsa < generic_ecdsa) && status == 0) {
+			printf("%s nistp implementation measured slower than the generic one\n", curve.name);
+			status = 3;
+		}
+		EC_GROUP_free(generic);
+		EC_GROUP_free(group);
+	}
+	return status;
+}
+#endif
@@ -0,0 +1,156 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#include <unistd.h>
+#include <dlfcn.h>
+#include <link.h>
+#include <stdint.h>
+#include <sys/wait.h>
+#include <algorithm>
+#include <string>
+#include <vector>
+
+// dynamic relocations of a loaded libssl or libcrypto
+struct Relocations {
+	std::string name;
+	unsigned long total;
+	unsigned long relative;
+	unsigned long plt;
+	bool bind_now;
+	bool gnu_hash;
+};
+
+static double now_us()
+{
+	struct timespec ts;
+	clock_gettime(CLOCK_MONOTONIC, &ts);
+	return ts.tv_sec * 1e6 + ts.tv_nsec / 1e3;
+}
+
+// loads the library and initializes libssl, returns the elapsed microseconds or a negative value
+static double load(const char *library)
+{
+	double start = now_us();
+	void *handle = dlopen(library, RTLD_LAZY | RTLD_LOCAL);
+	if (!handle) {
+		fprintf(stderr, "%s\n", dlerror());
+		return -1;
+	}
+	typedef int (*InitSSL)(uint64_t, const void *);
+	typedef int (*LibraryInit)(void);
+	if (void *init_ssl = dlsym(handle, "OPENSSL_init_ssl")) {
+		if (!((InitSSL)init_ssl)(0, NULL))
+			return -1;
+	} else if (void *library_init = dlsym(handle, "SSL_library_init")) {
+		((LibraryInit)library_init)();
+	} else {
+		fprintf(stderr, "neither OPENSSL_init_ssl nor SSL_library_init found in %s\n", library);
+		return -1;
+	}
+	return now_us() - start;
+}
+
+static int count_relocations(struct dl_phdr_info *info, size_t, void *data)
+{
+	std::vector<Relocations> *relocations = (std::vector<Relocations> *)data;
+	const char *name = strrchr(info->dlpi_name, '/');
+	name = name ? name + 1 : info->dlpi_name;
+	if (strncmp(name, "libssl", 6) != 0 && strncmp(name, "libcrypto", 9) != 0)
+		return 0;
+	for (int i = 0; i < info->dlpi_phnum; i++) {
+		if (info->dlpi_phdr[i].p_type != PT_DYNAMIC)
+			continue;
+		unsigned long size = 0, entry_size = 0, relative = 0, plt_size = 0, plt_type = DT_RELA;
+		Relocations result = {name, 0, 0, 0, false, false};
+		const ElfW(Dyn) *dyn = (const ElfW(Dyn) *)(info->dlpi_addr + info->dlpi_phdr[i].p_vaddr);
+		for (; dyn->d_tag != DT_NULL; dyn++) {
+			switch (dyn->d_tag) {
+			case DT_RELASZ: case DT_RELSZ: size = dyn->d_un.d_val; break;
+			case DT_RELAENT: case DT_RELENT: entry_size = dyn->d_un.d_val; break;
+			case DT_RELACOUNT: case DT_RELCOUNT: relative = dyn->d_un.d_val; break;
+			case DT_PLTRELSZ: plt_size = dyn->d_un.d_val; break;
+			case DT_PLTREL: plt_type = dyn->d_un.d_val; break;
+			case DT_FLAGS: result.bind_now |= (dyn->d_un.d_val & DF_BIND_NOW) != 0; break;
+			case DT_FLAGS_1: result.bind_now |= (dyn->d_un.d_val & DF_1_NOW) != 0; break;
+			case DT_BIND_NOW: result.bind_now = true; break;
+			case DT_GNU_HASH: result.gnu_hash = true; break;
+			}
+		}
+		result.total = entry_size ? size / entry_size : 0;
+		result.relative = relative;
+		result.plt = plt_size / (plt_type == DT_RELA ? sizeof(ElfW(Rela)) : sizeof(ElfW(Rel)));
+		relocations->push_back(result);
+	}
+	return 0;
+}
+
+int main(int argc, char **argv)
+{
+	if (argc < 3) {
+		fprintf(stderr, "usage: %s <libssl.so> <results.json> [iterations]\n", argv[0]);
+		return 1;
+	}
+	const char *library = argv[1];
+	const int iterations = argc > 3 ? atoi(argv[3]) : 100;
+
+	// every measurement runs in a fresh process, a library is loaded only once per process
+	std::vector<double> latencies;
+	for (int i = 0; i < iterations; i++) {
+		int fds[2];
+		if (pipe(fds) != 0) {
+			perror("pipe");
+			return 1;
+		}
+		pid_t pid = fork();
+		if (pid == 0) {
+			close(fds[0]);
+			double elapsed = load(library);
+			ssize_t written = write(fds[1], &elapsed, sizeof(elapsed));
+			_exit(written == sizeof(elapsed) ? 0 : 1);
+		}
+		close(fds[1]);
+		double elapsed = -1;
+		ssize_t received = read(fds[0], &elapsed, sizeof(elapsed));
+		close(fds[0]);
+		int status;
+		waitpid(pid, &status, 0);
+		if (received != sizeof(elapsed) || elapsed < 0) {
+			fprintf(stderr, "loading %s failed\n", library);
+			return 1;
+		}
+		latencies.push_back(elapsed);
+	}
+	std::sort(latencies.begin(), latencies.end());
+	double mean = 0;
+	for (double latency : latencies)
+		mean += latency / latencies.size();
+	double p50 = latencies[latencies.size() / 2], p90 = latencies[latencies.size() * 9 / 10];
+	printf("dlopen + init: mean %.1f us  p50 %.1f us  p90 %.1f us\n", mean, p50, p90);
+
+	if (load(library) < 0)
+		return 1;
+	std::vector<Relocations> relocations;
+	dl_iterate_phdr(count_relocations, &relocations);
+
+	FILE *json = fopen(argv[2], "w");
+	if (!json) {
+		perror(argv[2]);
+		return 1;
+	}
+	fprintf(json, "{\n  \"iterations\": %d,\n  \"mean_us\": %.1f,\n  \"p50_us\": %.1f,\n  \"p90_us\": %.1f,\n",
+	        iterations, mean, p50, p90);
+	fprintf(json, "  \"libraries\": [\n");
+	for (size_t i = 0; i < relocations.size(); i++) {
+		const Relocations &r = relocations[i];
+		printf("%-24s %6lu relocations (%lu relative, %lu symbolic) %5lu PLT, bind now: %s, gnu hash: %s\n",
+		       r.name.c_str(), r.total, r.relative, r.total - r.relative, r.plt, r.bind_now ? "yes" : "no",
+		       r.gnu_hash ? "yes" : "no");
+		fprintf(json, "    {\"name\": \"%s\", \"relocations\": %lu, \"relative\": %lu, \"plt\": %lu, "
+		        "\"bind_now\": %s, \"gnu_hash\": %s}%s\n", r.name.c_str(), r.total, r.relative, r.plt,
+		        r.bind_now ? "true" : "false", r.gnu_hash ? "true" : "false", i + 1 < relocations.size() ? "," : "");
+	}
+	fprintf(json, "  ]\n}\n");
+	fclose(json);
+	return 0;
+}
@@ -0,0 +1,384 @@
+#include <stdlib.h>
+#include <stdio.h>
+#include <string.h>
+#include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <string>
+#include <thread>
+#include <vector>
+#include <openssl/bio.h>
+#include <openssl/crypto.h>
+#include <openssl/err.h>
+#include <openssl/evp.h>
+#include <openssl/obj_mac.h>
+#include <openssl/opensslv.h>
+#include <openssl/ssl.h>
+#include <openssl/x509.h>
+#ifndef OPENSSL_NO_RSA
+#include <openssl/rsa.h>
+#else
+#include <openssl/ec.h>
+#endif
+
+#if OPENSSL_VERSION_NUMBER >= 0x10100000L
+#define OPENSSL_1_1_0_OR_LATER
+#endif
+#if OPENSSL_VERSION_NUMBER >= 0x10101000L
+#define OPENSSL_1_1_1_OR_LATER
+#endif
+#ifndef OPENSSL_1_1_0_OR_LATER
+#define TLS_method SSLv23_method
+#endif
+// 1.0.x needs locking callbacks to be used from several threads
+#if defined(OPENSSL_1_1_0_OR_LATER) && defined(OPENSSL_THREADS)
+#define BENCHMARK_THREADS
+#endif
+
+enum Resumption { FULL, SESSION_ID, TICKET };
+
+struct Scenario {
+	std::string name;
+	int version;
+	Resumption resumption;
+};
+
+struct Measurement {
+	double rate;
+	std::vector<double> latencies;  // microseconds per handshake
+};
+
+static void fail(const char *what)
+{
+	fprintf(stderr, "%s failed\n", what);
+	ERR_print_errors_fp(stderr);
+	exit(1);
+}
+
+static double seconds_since(std::chrono::steady_clock::time_point start)
+{
+	return std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+}
+
+static EVP_PKEY *server_key()
+{
+	EVP_PKEY *pkey = EVP_PKEY_new();
+#ifndef OPENSSL_NO_RSA
+	RSA *rsa = RSA_new();
+	BIGNUM *e = BN_new();
+	BN_set_word(e, RSA_F4);
+	if (!RSA_generate_key_ex(rsa, 2048, e, NULL))
+		fail("RSA_generate_key_ex");
+	BN_free(e);
+	EVP_PKEY_assign_RSA(pkey, rsa);
+#else
+	EC_KEY *ec = EC_KEY_new_by_curve_name(NID_X9_62_prime256v1);
+	if (!EC_KEY_generate_key(ec))
+		fail("EC_KEY_generate_key");
+	EVP_PKEY_assign_EC_KEY(pkey, ec);
+#endif
+	return pkey;
+}
+
+static X509 *self_signed(EVP_PKEY *pkey)
+{
+	X509 *cert = X509_new();
+	X509_set_version(cert, 2);
+	ASN1_INTEGER_set(X509_get_serialNumber(cert), 1);
+	X509_gmtime_adj(X509_get_notBefore(cert), 0);
+	X509_gmtime_adj(X509_get_notAfter(cert), 24 * 3600);
+	X509_set_pubkey(cert, pkey);
+	X509_NAME *name = X509_get_subject_name(cert);
+	X509_NAME_add_entry_by_txt(name, "CN", MBSTRING_ASC, (const unsigned char *)"localhost", -1, -1, 0);
+	X509_set_issuer_name(cert, name);
+	if (!X509_sign(cert, pkey, EVP_sha256()))
+		fail("X509_sign");
+	return cert;
+}
+
+static void set_version(SSL_CTX *ctx, int version)
+{
+#ifdef OPENSSL_1_1_0_OR_LATER
+	SSL_CTX_set_min_proto_version(ctx, version);
+	SSL_CTX_set_max_proto_version(ctx, version);
+#else
+	(void)version;
+	SSL_CTX_set_options(ctx, SSL_OP_NO_SSLv2 | SSL_OP_NO_SSLv3 | SSL_OP_NO_TLSv1 | SSL_OP_NO_TLSv1_1);
+#endif
+}
+
+struct Contexts {
+	SSL_CTX *server;
+	SSL_CTX *client;
+
+	Contexts(const Scenario &scenario, EVP_PKEY *pkey, X509 *cert)
+	{
+		server = SSL_CTX_new(TLS_method());
+		client = SSL_CTX_new(TLS_method());
+		if (!server || !client)
+			fail("SSL_CTX_new");
+		set_version(server, scenario.version);
+		set_version(client, scenario.version);
+		if (!SSL_CTX_use_certificate(server, cert) || !SSL_CTX_use_PrivateKey(server, pkey))
+			fail("SSL_CTX_use_certificate");
+		static const unsigned char id[] = "conan";
+		SSL_CTX_set_session_id_context(server, id, sizeof(id));
+		if (scenario.resumption == SESSION_ID) {
+			SSL_CTX_set_options(server, SSL_OP_NO_TICKET);
+			SSL_CTX_set_session_cache_mode(server, SSL_SESS_CACHE_SERVER);
+		} else {
+			SSL_CTX_set_session_cache_mode(server, SSL_SESS_CACHE_OFF);
+		}
+		SSL_CTX_set_session_cache_mode(client, SSL_SESS_CACHE_OFF);
+	}
+
+	~Contexts()
+	{
+		SSL_CTX_free(server);
+		SSL_CTX_free(client);
+	}
+};
+
+struct Connection {
+	SSL *server;
+	SSL *client;
+
+	Connection(const Contexts &contexts, SSL_SESSION *session)
+	{
+		server = SSL_new(contexts.server);
+		client = SSL_new(contexts.client);
+		BIO *server_bio, *client_bio;
+		if (!BIO_new_bio_pair(&server_bio, 0, &client_bio, 0))
+			fail("BIO_new_bio_pair");
+		SSL_set_bio(server, server_bio, server_bio);
+		SSL_set_bio(client, client_bio, client_bio);
+		SSL_set_accept_state(server);
+		SSL_set_connect_state(client);
+		if (session)
+			SSL_set_session(client, session);
+	}
+
+	~Connection()
+	{
+		// sessions of connections which were not shut down are evicted from the server cache
+		SSL_set_shutdown(server, SSL_SENT_SHUTDOWN | SSL_RECEIVED_SHUTDOWN);
+		SSL_set_shutdown(client, SSL_SENT_SHUTDOWN | SSL_RECEIVED_SHUTDOWN);
+		SSL_free(server);
+		SSL_free(client);
+	}
+
+	static bool progress(SSL *ssl, int ret)
+	{
+		if (ret > 0)
+			return true;
+		int error = SSL_get_error(ssl, ret);
+		if (error != SSL_ERROR_WANT_READ && error != SSL_ERROR_WANT_WRITE)
+			fail("TLS handshake");
+		return false;
+	}
+
+	void handshake()
+	{
+		bool client_done = false, server_done = false;
+		while (!client_done || !server_done) {
+			if (!client_done)
+				client_done = progress(client, SSL_do_handshake(client));
+			if (!server_done)
+				server_done = progress(server, SSL_do_handshake(server));
+		}
+	}
+
+	// moves size bytes from the client to the server, one record at a time
+	void transfer(const std::vector<char> &data, std::vector<char> &buffer)
+	{
+		int written = 0, read = 0, size = (int)data.size();
+		while (read < size) {
+			if (written < size) {
+				int ret = SSL_write(client, &data[written], size - written);
+				if (progress(client, ret))
+					written += ret;
+			}
+			int ret = SSL_read(server, &buffer[0], (int)buffer.size());
+			if (progress(server, ret))
+				read += ret;
+		}
+	}
+};
+
+// a session the server will accept for resumption
+static SSL_SESSION *resumable_session(const Contexts &contexts)
+{
+	Connection connection(contexts, NULL);
+	connection.handshake();
+	// TLS 1.3 tickets are sent after the handshake, reading data makes the client process them
+	char byte = 'x';
+	if (SSL_write(connection.server, &byte, 1) != 1 || SSL_read(connection.client, &byte, 1) != 1)
+		fail("reading the session ticket");
+	return SSL_get1_session(connection.client);
+}
+
+static Measurement handshakes(const Scenario &scenario, EVP_PKEY *pkey, X509 *cert, unsigned int threads,
+                              double duration)
+{
+	Contexts contexts(scenario, pkey, cert);
+	SSL_SESSION *session = scenario.resumption == FULL ? NULL : resumable_session(contexts);
+	std::vector<double> rates(threads, 0.0);
+	std::vector<std::vector<double> > latencies(threads);
+	std::atomic<bool> resumed(true);
+	auto worker = [&](unsigned int index) {
+		auto start = std::chrono::steady_clock::now();
+		unsigned long long count = 0;
+		double elapsed;
+		do {
+			auto handshake_start = std::chrono::steady_clock::now();
+			Connection connection(contexts, session);
+			connection.handshake();
+			latencies[index].push_back(seconds_since(handshake_start) * 1e6);
+			if (session && !SSL_session_reused(connection.client))
+				resumed = false;
+			count++;
+			elapsed = seconds_since(start);
+		} while (elapsed < duration);
+		rates[index] = count / elapsed;
+	};
+	if (threads == 1) {
+		worker(0);
+	} else {
+		std::vector<std::thread> pool;
+		for (unsigned int i = 0; i < threads; i++)
+			pool.push_back(std::thread(worker, i));
+		for (auto &thread : pool)
+			thread.join();
+	}
+	if (session)
+		SSL_SESSION_free(session);
+	if (!resumed) {
+		fprintf(stderr, "%s: the session was not resumed\n", scenario.name.c_str());
+		exit(1);
+	}
+
+	Measurement measurement = {0.0, std::vector<double>()};
+	for (unsigned int i = 0; i < threads; i++) {
+		measurement.rate += rates[i];
+		measurement.latencies.insert(measurement.latencies.end(), latencies[i].begin(), latencies[i].end());
+	}
+	std::sort(measurement.latencies.begin(), measurement.latencies.end());
+	return measurement;
+}
+
+static double bulk(const Scenario &scenario, EVP_PKEY *pkey, X509 *cert, unsigned int threads, double duration)
+{
+	Contexts contexts(scenario, pkey, cert);
+	std::vector<double> rates(threads, 0.0);
+	auto worker = [&](unsigned int index) {
+		Connection connection(contexts, NULL);
+		connection.handshake();
+		std::vector<char> data(16384, 'x'), buffer(16384);
+		auto start = std::chrono::steady_clock::now();
+		unsigned long long bytes = 0;
+		double elapsed;
+		do {
+			connection.transfer(data, buffer);
+			bytes += data.size();
+			elapsed = seconds_since(start);
+		} while (elapsed < duration);
+		rates[index] = bytes / elapsed;
+	};
+	if (threads == 1) {
+		worker(0);
+	} else {
+		std::vector<std::thread> pool;
+		for (unsigned int i = 0; i < threads; i++)
+			pool.push_back(std::thread(worker, i));
+		for (auto &thread : pool)
+			thread.join();
+	}
+	double total = 0.0;
+	for (double rate : rates)
+		total += rate;
+	return total;
+}
+
+static double percentile(const std::vector<double> &sorted, double p)
+{
+	if (sorted.empty())
+		return 0.0;
+	size_t index = (size_t)(p * (sorted.size() - 1));
+	return sorted[index];
+}
+
+int main(int argc, char **argv)
+{
+	if (argc < 2) {
+		fprintf(stderr, "usage: %s <results.json> [seconds per measurement] [threads]\n", argv[0]);
+		return 1;
+	}
+	const double duration = argc > 2 ? atof(argv[2]) : 1.0;
+	unsigned int threads = argc > 3 ? (unsigned int)atoi(argv[3]) : 1;
+#ifndef BENCHMARK_THREADS
+	threads = 1;
+#endif
+	if (threads < 1)
+		threads = 1;
+
+	SSL_library_init();
+	SSL_load_error_strings();
+
+	EVP_PKEY *pkey = server_key();
+	X509 *cert = self_signed(pkey);
+
+	std::vector<Scenario> scenarios;
+#ifndef OPENSSL_NO_TLS1_2
+	scenarios.push_back(Scenario{"tls1.2-full", TLS1_2_VERSION, FULL});
+	scenarios.push_back(Scenario{"tls1.2-session-id", TLS1_2_VERSION, SESSION_ID});
+	scenarios.push_back(Scenario{"tls1.2-ticket", TLS1_2_VERSION, TICKET});
+#endif
+#ifdef OPENSSL_1_1_1_OR_LATER
+	scenarios.push_back(Scenario{"tls1.3-full", TLS1_3_VERSION, FULL});
+	scenarios.push_back(Scenario{"tls1.3-ticket", TLS1_3_VERSION, TICKET});
+#endif
+
+	std::vector<Measurement> measurements;
+	for (const Scenario &scenario : scenarios) {
+		measurements.push_back(handshakes(scenario, pkey, cert, threads, duration));
+		const std::vector<double> &latencies = measurements.back().latencies;
+		printf("%-20s %10.0f handshakes/s  p50 %8.1f us  p90 %8.1f us  p99 %8.1f us\n", scenario.name.c_str(),
+		       measurements.back().rate, percentile(latencies, 0.5), percentile(latencies, 0.9),
+		       percentile(latencies, 0.99));
+	}
+	std::vector<Scenario> bulk_scenarios;
+	std::vector<double> bulk_rates;
+	for (const Scenario &scenario : scenarios) {
+		if (scenario.resumption != FULL)
+			continue;
+		bulk_scenarios.push_back(scenario);
+		bulk_rates.push_back(bulk(scenario, pkey, cert, threads, duration));
+		printf("%-20s %14.0f bytes/s\n", scenario.name.c_str(), bulk_rates.back());
+	}
+
+	FILE *json = fopen(argv[1], "w");
+	if (!json) {
+		perror(argv[1]);
+		return 1;
+	}
+	fprintf(json, "{\n  \"openssl\": \"%s\",\n  \"threads\": %u,\n  \"handshakes\": [\n",
+	        SSLeay_version(SSLEAY_VERSION), threads);
+	for (size_t i = 0; i < scenarios.size(); i++) {
+		const std::vector<double> &latencies = measurements[i].latencies;
+		fprintf(json, "    {\"name\": \"%s\", \"value\": %.1f, \"unit\": \"handshakes/s\", "
+		              "\"p50_us\": %.1f, \"p90_us\": %.1f, \"p99_us\": %.1f}%s\n",
+		        scenarios[i].name.c_str(), measurements[i].rate, percentile(latencies, 0.5),
+		        percentile(latencies, 0.9), percentile(latencies, 0.99), i + 1 < scenarios.size() ? "," : "");
+	}
+	fprintf(json, "  ],\n  \"bulk\": [\n");
+	for (size_t i = 0; i < bulk_scenarios.size(); i++) {
+		fprintf(json, "    {\"name\": \"%s\", \"value\": %.1f, \"unit\": \"bytes/s\"}%s\n",
+		        bulk_scenarios[i].name.c_str(), bulk_rates[i], i + 1 < bulk_scenarios.size() ? "," : "");
+	}
+	fprintf(json, "  ]\n}\n");
+	fclose(json);
+
+	X509_free(cert);
+	EVP_PKEY_free(pkey);
+	return 0;
+}
@@ -0,0 +1,138 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+// exit status: 0 a sampled stack unwinds from libcrypto through an EVP_ function with frame pointers,
+// 1 none does, 2 the check isn't supported on this platform
+#if defined(__linux__) && (defined(__x86_64__) || defined(__aarch64__))
+#ifndef _GNU_SOURCE
+#define _GNU_SOURCE
+#endif
+#include <dlfcn.h>
+#include <signal.h>
+#include <stdint.h>
+#include <sys/time.h>
+#include <ucontext.h>
+#include <openssl/evp.h>
+
+#define MAX_SAMPLES 1024
+#define MAX_FRAMES 32
+
+struct Sample {
+	uintptr_t frames[MAX_FRAMES];
+	int count;
+	bool reached; // the frame pointer chain led back to hash_loop
+};
+
+static Sample samples[MAX_SAMPLES];
+static volatile int sample_count = 0;
+static uintptr_t *volatile loop_frame = NULL;
+
+// walks the frame pointer chain of the interrupted code, the way perf and eBPF profilers do
+static void sample(int, siginfo_t *, void *context)
+{
+	if (sample_count >= MAX_SAMPLES || !loop_frame)
+		return;
+	ucontext_t *uc = (ucontext_t *)context;
+#if defined(__x86_64__)
+	uintptr_t pc = uc->uc_mcontext.gregs[REG_RIP];
+	uintptr_t *fp = (uintptr_t *)uc->uc_mcontext.gregs[REG_RBP];
+#else
+	uintptr_t pc = uc->uc_mcontext.pc;
+	uintptr_t *fp = (uintptr_t *)uc->uc_mcontext.regs[29];
+#endif
+	Sample &s = samples[sample_count];
+	s.frames[0] = pc;
+	s.count = 1;
+	s.reached = false;
+	uintptr_t *stack_low = (uintptr_t *)&uc;
+	// a valid frame lies between this handler and hash_loop, each one above the previous
+	while (s.count < MAX_FRAMES && fp > stack_low && fp <= loop_frame && ((uintptr_t)fp % sizeof(void *)) == 0) {
+		if (fp == loop_frame) {
+			s.reached = true;
+			break;
+		}
+		uintptr_t *next = (uintptr_t *)fp[0];
+		s.frames[s.count++] = fp[1];
+		if (next <= fp)
+			break;
+		fp = next;
+	}
+	sample_count++;
+}
+
+static volatile unsigned char sink;
+
+// exported (ENABLE_EXPORTS), so that it shows up by name in the example stack
+extern "C" __attribute__((noinline)) void hash_loop(double seconds)
+{
+	loop_frame = (uintptr_t *)__builtin_frame_address(0);
+	unsigned char input[1024], digest[EVP_MAX_MD_SIZE];
+	memset(input, 'x', sizeof(input));
+	struct timeval start, now;
+	gettimeofday(&start, NULL);
+	do {
+		for (int i = 0; i < 256; i++) {
+			unsigned int digest_len;
+			EVP_Digest(input, sizeof(input), digest, &digest_len, EVP_sha256(), NULL);
+			sink ^= digest[0];
+		}
+		gettimeofday(&now, NULL);
+	} while (sample_count < MAX_SAMPLES &&
+	         (now.tv_sec - start.tv_sec) + (now.tv_usec - start.tv_usec) / 1e6 < seconds);
+	loop_frame = NULL;
+}
+
+static const char *symbol(uintptr_t address)
+{
+	Dl_info info;
+	// return addresses point after the call, the call itself belongs to the caller
+	if (dladdr((void *)(address - 1), &info) && info.dli_sname)
+		return info.dli_sname;
+	return "?";
+}
+
+int main(int argc, char **argv)
+{
+	const double seconds = argc > 1 ? atof(argv[1]) : 2.0;
+	struct sigaction action;
+	memset(&action, 0, sizeof(action));
+	action.sa_sigaction = sample;
+	action.sa_flags = SA_SIGINFO | SA_RESTART;
+	sigaction(SIGPROF, &action, NULL);
+	struct itimerval timer = {{0, 1000}, {0, 1000}};
+	setitimer(ITIMER_PROF, &timer, NULL);
+	hash_loop(seconds);
+	struct itimerval stop = {{0, 0}, {0, 0}};
+	setitimer(ITIMER_PROF, &stop, NULL);
+
+	int reached = 0, through_evp = 0;
+	const Sample *example = NULL;
+	for (int i = 0; i < sample_count; i++) {
+		if (!samples[i].reached)
+			continue;
+		reached++;
+		for (int j = 1; j < samples[i].count; j++) {
+			if (strncmp(symbol(samples[i].frames[j]), "EVP_", 4) == 0) {
+				through_evp++;
+				example = example ? example : &samples[i];
+				break;
+			}
+		}
+	}
+	printf("%d samples, %d unwound to hash_loop, %d through EVP_ functions\n", sample_count, reached, through_evp);
+	if (!example)
+		return 1;
+	printf("example stack:");
+	for (int j = 0; j < example->count; j++)
+		printf(" %s%s", j ? "<- " : "", symbol(example->frames[j] + (j ? 0 : 1)));
+	printf("\n");
+	return 0;
+}
+#else
+int main()
+{
+	printf("frame pointer unwinding is only checked on x86_64 and aarch64 Linux\n");
+	return 2;
+}
+#endif
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# OpenSSLConan._get_tarball against tarballs served by http.server on localhost:
+#     python -m pytest tests
+
+import io
+import os
+import sys
+import shutil
+import hashlib
+import tarfile
+import tempfile
+import time
+import threading
+import unittest
+from unittest import mock
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+from conans import tools
+from conans.client.output import ConanOutput
+from conans.errors import ConanException
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conanfile import OpenSSLConan  # noqa: E402
+
+VERSION = "1.1.1c"
+
+
+def make_tarball(members, links=()):
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode="w:gz") as tar:
+        for name, content in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+        for name, target in links:
+            info = tarfile.TarInfo(name)
+            info.type = tarfile.SYMTYPE
+            info.linkname = target
+            tar.addfile(info)
+    return data.getvalue()
+
+
+class _Recipe(OpenSSLConan):
+    mirrors = []
+
+    @property
+    def _source_mirrors(self):
+        return self.mirrors  # never the official urls
+
+
+class SourceCacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        cls.tarball = make_tarball([("openssl-%s/Configure" % VERSION, b"#!/usr/bin/env perl\n"),
+                                    ("openssl-%s/README" % VERSION, b"OpenSSL\n")])
+        cls.sha256 = hashlib.sha256(cls.tarball).hexdigest()
+        cls.linked = make_tarball([("openssl-%s/crypto/opensslv.h" % VERSION, b"#define OPENSSL_VERSION\n")],
+                                  [("openssl-%s/include/openssl/opensslv.h" % VERSION, "../../crypto/opensslv.h")])
+        served = os.path.join(cls.root, "served")
+        for mirror, content in [("good", cls.tarball), ("linked", cls.linked), ("evil", make_tarball([
+                ("openssl-%s/../escaped" % VERSION, b"x")]))]:
+            os.makedirs(os.path.join(served, mirror))
+            with open(os.path.join(served, mirror, "openssl-%s.tar.gz" % VERSION), "wb") as f:
+                f.write(content)
+
+        requests = cls.requests = []
+
+        class Handler(SimpleHTTPRequestHandler):
+            def __init__(self, *args, **kwargs):
+                kwargs["directory"] = served
+                SimpleHTTPRequestHandler.__init__(self, *args, **kwargs)
+
+            def do_GET(self):
+                requests.append(self.path)
+                SimpleHTTPRequestHandler.do_GET(self)
+
+            def log_message(self, *args):
+                pass
+
+        cls.server = HTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = "http://127.0.0.1:%d/" % cls.server.server_port
+        threading.Thread(target=cls.server.serve_forever).start()
+        cls._global_instances = tools.get_global_instances()
+        tools.set_global_instances(ConanOutput(sys.stdout), __import__("requests"), None)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        tools.set_global_instances(*(cls._global_instances + (None,)))
+        shutil.rmtree(cls.root)
+
+    def setUp(self):
+        del self.requests[:]
+        self.cache = tempfile.mkdtemp(dir=self.root)
+        self.workdir = tempfile.mkdtemp(dir=self.root)
+
+    def get_tarball(self, mirrors, sha256=None, offline=False, cache_size=None):
+        recipe = _Recipe(ConanOutput(sys.stdout), None, display_name="OpenSSL")
+        recipe.version = VERSION
+        recipe.mirrors = [self.url + mirror + "/" for mirror in mirrors]
+        env = {"CONAN_OPENSSL_SOURCE_CACHE": self.cache, "CONAN_OPENSSL_OFFLINE": "1" if offline else None,
+               "CONAN_OPENSSL_SOURCE_CACHE_SIZE": str(cache_size) if cache_size else None}
+        with tools.environment_append(env), tools.chdir(self.workdir):
+            recipe._get_tarball(sha256 or self.sha256)
+
+    def add_to_cache(self, filename, content, age):
+        path = os.path.join(self.cache, filename)
+        with open(path, "wb") as f:
+            f.write(content)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def sources(self):
+        return os.path.join(self.workdir, "sources")
+
+    def test_mirror_fallback(self):
+        self.get_tarball(["missing", "good"])
+        self.assertEqual(["/missing/openssl-%s.tar.gz" % VERSION, "/good/openssl-%s.tar.gz" % VERSION],
+                         self.requests)
+        self.assertTrue(os.path.isfile(os.path.join(self.sources(), "Configure")))
+        self.assertEqual(["%s.tar.gz" % self.sha256], os.listdir(self.cache))
+        self.assertEqual(["sources"], os.listdir(self.workdir))  # no staging leftovers
+
+    def test_cache_hit(self):
+        self.get_tarball(["good"])
+        shutil.rmtree(self.sources())
+        del self.requests[:]
+        self.get_tarball(["good"], offline=True)
+        self.assertEqual([], self.requests)
+        self.assertTrue(os.path.isfile(os.path.join(self.sources(), "README")))
+
+    def test_eviction(self):
+        # 3 MB of older tarballs against a 2 MB budget, the tarball used by a cache hit was the oldest of all
+        fillers = [self.add_to_cache("%s.tar.gz" % (str(age) * 64)[:64], b"x" * 1024 * 1024, age)
+                   for age in [300, 200, 100]]
+        used = self.add_to_cache("%s.tar.gz" % self.sha256, self.tarball, 1000)
+        self.get_tarball(["good"], offline=True, cache_size=2)
+        shutil.rmtree(self.sources())
+
+        linked_sha256 = hashlib.sha256(self.linked).hexdigest()
+        self.get_tarball(["linked"], sha256=linked_sha256, cache_size=2)
+        self.assertEqual(sorted([os.path.basename(fillers[2]), os.path.basename(used), "%s.tar.gz" % linked_sha256]),
+                         sorted(os.listdir(self.cache)))
+
+    def test_offline_miss(self):
+        with self.assertRaisesRegex(ConanException, "CONAN_OPENSSL_OFFLINE"):
+            self.get_tarball(["good"], offline=True)
+        self.assertEqual([], self.requests)
+        self.assertFalse(os.path.exists(self.sources()))
+
+    def test_sha256_mismatch(self):
+        with self.assertRaisesRegex(ConanException, "could not download"):
+            self.get_tarball(["good"], sha256="0" * 64)
+        self.assertEqual(["/good/openssl-%s.tar.gz" % VERSION], self.requests)
+        self.assertFalse(os.path.exists(self.sources()))
+        self.assertEqual([], os.listdir(self.cache))
+        self.assertEqual([], os.listdir(self.workdir))
+
+    def test_path_traversal(self):
+        evil = make_tarball([("openssl-%s/../escaped" % VERSION, b"x")])
+        with self.assertRaisesRegex(ConanException, "could not download"):
+            self.get_tarball(["evil"], sha256=hashlib.sha256(evil).hexdigest())
+        self.assertFalse(os.path.exists(os.path.join(self.workdir, "escaped")))
+        self.assertFalse(os.path.exists(self.sources()))
+
+    def test_symbolic_links(self):
+        self.get_tarball(["linked"], sha256=hashlib.sha256(self.linked).hexdigest())
+        header = os.path.join(self.sources(), "include", "openssl", "opensslv.h")
+        self.assertTrue(os.path.islink(header))
+        self.assertEqual("#define OPENSSL_VERSION\n", tools.load(header))
+
+    def test_symbolic_links_copied_on_windows(self):
+        with mock.patch.object(tools.os_info, "is_windows", True):
+            self.get_tarball(["linked"], sha256=hashlib.sha256(self.linked).hexdigest())
+        header = os.path.join(self.sources(), "include", "openssl", "opensslv.h")
+        self.assertFalse(os.path.islink(header))
+        self.assertEqual("#define OPENSSL_VERSION\n", tools.load(header))
+
+
+if __name__ == "__main__":
+    unittest.main()